@@ -1,16 +1,25 @@
-import yt_dlp
 import random
 import time
 import logging
 import threading
 import re
+import copy
+import hashlib
+import subprocess
+import queue
+import sqlite3
 from concurrent.futures import ThreadPoolExecutor
-from tqdm import tqdm
-import yt_dlp
 import os
 import json
 from pathlib import Path
-from concurrent.futures import as_completed
+from collections import deque
+from journal import Journal
+from paths import HISTORY_DIR
+from content_index import get_content_index, close_content_index
+from storage import get_storage_manager
+from work_queue import get_work_queue, close_work_queue, DOWNLOAD
+from metrics import Metrics, RATE_BUCKETS, serve_metrics, start_json_dump
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
 
 #print(f"Download path: {os.path.abspath(download_path)}")  
 
@@ -26,29 +35,166 @@ download_lock = threading.Lock()
 successful_downloads = 0
 failed_downloads = 0
 
-# Auto-create history directory
-HISTORY_DIR = r"C:\Users\meetd\Desktop\YT root\Core"
+# Stage metrics, served as Prometheus text and dumped as JSON while running
+# None disables the HTTP endpoint; set YT_METRICS_PORT per process when several run on one host
+METRICS_PORT = int(os.environ.get("YT_METRICS_PORT", 9108)) or None
+METRICS_DUMP_INTERVAL = 15
+metrics = Metrics("shorts_downloader")
+metrics.declare('stage_seconds', 'histogram', 'Latency of each pipeline stage')
+metrics.declare('video_bytes_per_second', 'histogram', 'Download rate per video', RATE_BUCKETS)
+metrics.declare('retries_total', 'counter', 'Failed attempts by stage and cause')
+metrics.declare('videos_total', 'counter', 'Videos by outcome')
+metrics.declare('metadata_cache_total', 'counter', 'Metadata cache hits and misses')
+metrics.declare('bytes_total', 'counter', 'Bytes downloaded')
+metrics.declare('workers_total', 'gauge', 'Pool size')
+metrics.declare('workers_busy', 'gauge', 'Workers currently busy')
+metrics.declare('worker_busy_seconds_total', 'counter', 'Busy time summed over workers')
+metrics.declare('worker_utilisation', 'gauge', 'Busy time / (pool size * run time)')
+_metrics_started = time.monotonic()
+
+def note_worker_time(pool, seconds):
+    """Account busy time for a pool and refresh its utilisation gauge"""
+    metrics.inc('worker_busy_seconds_total', seconds, pool=pool)
+    with metrics.lock:
+        busy = metrics.values['worker_busy_seconds_total'].get((('pool', pool),), 0)
+        size = metrics.values['workers_total'].get((('pool', pool),), 0)
+    elapsed = time.monotonic() - _metrics_started
+    if size and elapsed > 0:
+        metrics.set('worker_utilisation', busy / (size * elapsed), pool=pool)
+
+# Auto-create history directory (YT_HISTORY_DIR overrides it, e.g. per node; see paths.py)
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
-DOWNLOAD_HISTORY_FILE = r"C:\Users\meetd\Desktop\YT root\Core\download_history.log"
-CHANNEL_HISTORY_FILE = r"C:\Users\meetd\Desktop\YT root\Core\channel_history.json"
+DOWNLOAD_HISTORY_FILE = os.path.join(HISTORY_DIR, "download_history.log")
+CHANNEL_HISTORY_FILE = os.path.join(HISTORY_DIR, "channel_history.json")
+
+HISTORY_DB_FILE = os.path.join(HISTORY_DIR, "channel_history.db")
+
+# "json" keeps everything in channel_history.json, "sqlite" uses an indexed on-disk table
+HISTORY_BACKEND = "json"
+
+
+class HistoryStore:
+    """Channel history loaded once per process and kept as a set per channel"""
+
+    def __init__(self, json_file, db_file=None):
+        self.json_file = json_file
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.db = None
+        self.journal = None
+        if db_file:
+            self._open_db()
+        else:
+            self.journal = Journal(json_file)
+            self.channels = self.journal.load()
+
+    def _open_db(self):
+        """Open the SQLite index, seeding it from the JSON history on first use"""
+        self.db = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "channel_id TEXT NOT NULL, video_id TEXT NOT NULL, "
+            "PRIMARY KEY (channel_id, video_id)) WITHOUT ROWID"
+        )
+        empty = self.db.execute("SELECT 1 FROM history LIMIT 1").fetchone() is None
+        if empty and Path(self.json_file).exists():
+            with open(self.json_file, 'r') as f:
+                data = json.load(f) or {}
+            with self.db:
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO history VALUES (?, ?)",
+                    ((channel, vid) for channel, ids in data.items() for vid in ids)
+                )
+            logging.info(f"Seeded history index from {self.json_file}")
+
+    def _channel(self, channel_id):
+        """Return the in-memory set for a channel (caller holds the lock)"""
+        ids = self.channels.get(channel_id)
+        if ids is None:
+            ids = set()
+            if self.db is not None:
+                rows = self.db.execute(
+                    "SELECT video_id FROM history WHERE channel_id = ?", (channel_id,)
+                )
+                ids.update(row[0] for row in rows)
+            self.channels[channel_id] = ids
+        return ids
+
+    def contains(self, channel_id, video_id):
+        with self.lock:
+            return video_id in self._channel(channel_id)
+
+    def get_channel(self, channel_id):
+        with self.lock:
+            return set(self._channel(channel_id))
+
+    def filter_new(self, channel_id, items, key=lambda item: item):
+        """Keep items whose video ID is not tracked for the channel"""
+        with self.lock:
+            known = self._channel(channel_id)
+            return [item for item in items if key(item) not in known]
+
+    def add(self, channel_id, video_ids):
+        video_ids = [vid for vid in video_ids if vid]
+        with self.lock:
+            known = self._channel(channel_id)
+            new_ids = [vid for vid in video_ids if vid not in known]
+            if not new_ids:
+                return
+            known.update(new_ids)
+            if self.db is not None:
+                with self.db:
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO history VALUES (?, ?)",
+                        ((channel_id, vid) for vid in new_ids)
+                    )
+            else:
+                self.journal.append(channel_id, new_ids)
+
+    def snapshot(self):
+        with self.lock:
+            if self.db is not None:
+                for (channel_id,) in self.db.execute("SELECT DISTINCT channel_id FROM history"):
+                    self._channel(channel_id)
+            return {channel: list(ids) for channel, ids in self.channels.items()}
+
+    def close(self):
+        """Flush pending writes and fold the journal into channel_history.json"""
+        if self.journal is not None:
+            self.journal.close()
+        if self.db is not None:
+            self.db.close()
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+def get_history_store():
+    """Return the process-wide history store, loading it on first use"""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            db_file = HISTORY_DB_FILE if HISTORY_BACKEND == "sqlite" else None
+            _history_store = HistoryStore(CHANNEL_HISTORY_FILE, db_file)
+        return _history_store
 
 def load_history():
-    if Path(CHANNEL_HISTORY_FILE).exists():
-        with open(CHANNEL_HISTORY_FILE, 'r') as f:
-            return json.load(f) or {}
-    return {}
+    return get_history_store().snapshot()
 
 def is_video_downloaded(channel_id, video_id):
-    """Check if video exists in history"""
-    history = load_history()
-    return video_id in history.get(channel_id, []) 
+    """Check if video exists in history (this node's, then the shared one)"""
+    with metrics.timer('stage_seconds', stage='history_filter'):
+        if get_history_store().contains(channel_id, video_id):
+            return True
+        work_queue = get_work_queue()
+        return work_queue is not None and work_queue.is_done(DOWNLOAD, channel_id, video_id)
 
 def mark_video_downloaded(channel_id, video_id):
-    data = load_history()
-    data.setdefault(channel_id, []).append(video_id)
-    with open(CHANNEL_HISTORY_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    with metrics.timer('stage_seconds', stage='history_write'):
+        get_history_store().add(channel_id, [video_id])
 
 # Duplicate Check
 
@@ -69,33 +215,17 @@ def get_channel_id(url):
 
 def get_channel_history(channel_id):
     """Get existing video IDs for a channel"""
-    if not Path(CHANNEL_HISTORY_FILE).exists():
-        return []
-    with open(CHANNEL_HISTORY_FILE, 'r') as f:
-        history = json.load(f)
-    return set(history.get(channel_id, []))
+    return get_history_store().get_channel(channel_id)
 
 def update_channel_history(channel_id, video_ids):
     """Update channel download records"""
-    history = {}
-    if Path(CHANNEL_HISTORY_FILE).exists():
-        with open(CHANNEL_HISTORY_FILE, 'r') as f:
-            history = json.load(f)
-    
-    history[channel_id] = list(set(history.get(channel_id, []) + video_ids))
-    
-    with open(CHANNEL_HISTORY_FILE, 'w') as f:
-        json.dump(history, f)
+    get_history_store().add(channel_id, video_ids)
 
 def filter_new_videos(channel_id, video_urls):
     """Filter out tracked videos"""
-    filtered = []
-    for url in video_urls:
-        vid = extract_video_id(url)
-        if not is_video_downloaded(channel_id, vid):
+    with metrics.timer('stage_seconds', stage='history_filter'):
+        return get_history_store().filter_new(channel_id, video_urls, key=extract_video_id)
 
-            filtered.append(url)
-    return filtered
 # ---------------------------
 # Helper Functions
 # ---------------------------
@@ -112,44 +242,474 @@ def validate_url(url):
         return url.rstrip('/')
     return f"{url.rstrip('/')}/shorts"
 
-def fetch_video_urls(target_url, max_retries):
-    """Fetch Shorts with multiple fallback strategies"""
+def load_yt_dlp():
+    """Import yt_dlp on first use; plans and history queries never pay for it"""
+    import yt_dlp
+    return yt_dlp
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15"
+]
+
+# ---------------------------
+# YoutubeDL handle pool
+# ---------------------------
+# Set to False to build a fresh YoutubeDL per attempt (the old behaviour) when
+# comparing setup overhead
+YDL_POOL_ENABLED = True
+
+_ydl_local = threading.local()
+_ydl_handles = []  # (owning thread, handle)
+_ydl_stats = {'handles': 0, 'setup_seconds': 0.0, 'videos': 0}
+_ydl_lock = threading.Lock()
+
+def acquire_ydl(opts):
+    """Return this thread's long-lived YoutubeDL for the given option set
+
+    Handles keep their extractors, cookie jar and HTTP connections for the
+    whole run. Each thread gets its own because YoutubeDL is not thread-safe.
+    """
+    key = json.dumps(opts, sort_keys=True, default=str)
+    handles = getattr(_ydl_local, 'handles', None)
+    if handles is None:
+        handles = _ydl_local.handles = {}
+
+    ydl = handles.get(key) if YDL_POOL_ENABLED else None
+    if ydl is None:
+        params = dict(opts)
+        params.setdefault('http_headers', {'User-Agent': random.choice(USER_AGENTS)})
+        start = time.perf_counter()
+        ydl = load_yt_dlp().YoutubeDL(params)
+        elapsed = time.perf_counter() - start
+        with _ydl_lock:
+            _ydl_stats['handles'] += 1
+            _ydl_stats['setup_seconds'] += elapsed
+            if YDL_POOL_ENABLED:
+                _ydl_handles.append((threading.current_thread(), ydl))
+        if YDL_POOL_ENABLED:
+            handles[key] = ydl
+    return ydl
+
+def release_ydl(ydl):
+    """Close handles that are not pooled"""
+    if not YDL_POOL_ENABLED:
+        ydl.close()
+
+def close_ydl_pool(finished_only=False):
+    """Close pooled handles, saving cookies once per handle
+
+    With finished_only, only handles whose thread has exited are closed; a
+    finished worker pool's handles can never be reused, so long-running
+    callers prune them after each sync instead of accumulating them.
+    """
+    with _ydl_lock:
+        handles = [ydl for thread, ydl in _ydl_handles if not (finished_only and thread.is_alive())]
+        _ydl_handles[:] = [(thread, ydl) for thread, ydl in _ydl_handles if ydl not in handles]
+    for ydl in handles:
+        try:
+            ydl.close()
+        except Exception as e:
+            logging.warning(f"Error closing YoutubeDL handle: {str(e)}")
+
+def count_setup_video():
+    with _ydl_lock:
+        _ydl_stats['videos'] += 1
+
+def setup_overhead_report():
+    """YoutubeDL construction cost for the run, total and per video"""
+    with _ydl_lock:
+        stats = dict(_ydl_stats)
+    per_video = stats['setup_seconds'] / stats['videos'] if stats['videos'] else 0.0
+    return (
+        f"YoutubeDL setup: {stats['handles']} handles, {stats['setup_seconds']:.3f}s total, "
+        f"{per_video * 1000:.1f} ms/video over {stats['videos']} videos "
+        f"(pool {'on' if YDL_POOL_ENABLED else 'off'})"
+    )
+
+# ---------------------------
+# Request rate limiting
+# ---------------------------
+RATE_LIMIT_PER_SEC = 2.0   # Sustained metadata + media requests per second
+RATE_LIMIT_BURST = 10
+ENTRIES_PER_PAGE = 30      # Roughly one playlist continuation request per this many entries
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request in the process"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Set by batch mode; single-channel runs are not throttled
+rate_limiter = None
+
+def throttle():
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+
+def is_short_entry(entry):
+    """Flat entries usually lack a duration; only drop the ones known to be too long"""
+    return (entry.get('duration') or 0) <= 60
+
+_END = object()
+
+def iter_video_urls(target_url, max_retries, state=None):
+    """Yield Shorts URLs as yt_dlp pages the playlist in
+
+    If all retries fail, state['failed'] is set so callers can tell an empty
+    channel from an aborted enumeration.
+    """
     ydl_opts = {
         'quiet': True,
         'extract_flat': 'in_playlist',
-        'match_filter': lambda info: info.get('duration', 0) <= 60,
         'ignoreerrors': True,
         'default_search': 'ytsearch',
         'cookiefile': 'cookies.txt'  # Optional: use cookies for logged-in access
     }
-    
+
+    seen = set()
     retries = 0
     while retries < max_retries:
+        ydl = acquire_ydl(ydl_opts)
         try:
-            user_agent = random.choice([
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/113.0.0.0 Safari/537.36",
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.4 Safari/605.1.15"
-            ])
-            ydl_opts['http_headers'] = {'User-Agent': user_agent}
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(target_url, download=False)
+            # process=False leaves 'entries' as the extractor's lazy page generator
+            throttle()
+            with metrics.timer('stage_seconds', stage='playlist_fetch'):
+                info = ydl.extract_info(target_url, download=False, process=False)
+                while info and info.get('_type') in ('url', 'url_transparent'):
+                    throttle()
+                    info = ydl.extract_info(info['url'], download=False, process=False)
 
             if not info or 'entries' not in info:
-                return []
+                return
 
-            return [entry['url'] for entry in info['entries'] if entry]
-            
-            if not is_video_downloaded(my_channel_id, vid_id):
-                download(vid_id)
-                mark_video_downloaded(my_channel_id, vid_id)
+            entries = iter(info['entries'])
+            position = 0
+            paging_seconds = 0.0
+            while True:
+                # Only the time spent inside the page generator counts as fetch latency
+                fetch_started = time.perf_counter()
+                entry = next(entries, _END)
+                paging_seconds += time.perf_counter() - fetch_started
+                if entry is _END:
+                    break
+                position += 1
+                if position % ENTRIES_PER_PAGE == 0:
+                    metrics.observe('stage_seconds', paging_seconds, stage='playlist_fetch')
+                    paging_seconds = 0.0
+                    throttle()
+                if not entry or not entry.get('url') or not is_short_entry(entry):
+                    continue
+                # A retry re-pages from the top; skip what was already yielded
+                if entry['url'] in seen:
+                    continue
+                seen.add(entry['url'])
+                yield entry['url']
+            return
         except Exception as e:
+            metrics.inc('retries_total', stage='playlist_fetch', cause=classify_error(e))
             retries += 1
             logging.warning(f"Fetch error (Attempt {retries}/{max_retries}): {str(e)}")
             time.sleep(min(2 ** retries, 30) + random.uniform(0, 1))
-    
+        finally:
+            release_ydl(ydl)
+
     logging.error("Failed to fetch video URLs after retries.")
-    return []
+    if state is not None:
+        state['failed'] = True
+
+def fetch_video_urls(target_url, max_retries):
+    """Fetch Shorts with multiple fallback strategies"""
+    return list(iter_video_urls(target_url, max_retries))
+
+WATERMARK_FILE = os.path.join(HISTORY_DIR, "channel_watermarks.json")
+FULL_RESCAN_DAYS = 7  # Re-enumerate the whole channel this often to catch reordering
+# Stop an incremental sync after this many consecutive already-downloaded
+# entries, in case the watermark video was deleted or made private
+WATERMARK_KNOWN_RUN = 30
+watermark_lock = threading.Lock()
+
+def load_watermark(channel_id):
+    """Newest known video ID, its playlist position and last full scan time"""
+    if not Path(WATERMARK_FILE).exists():
+        return None
+    with open(WATERMARK_FILE, 'r') as f:
+        return (json.load(f) or {}).get(channel_id)
+
+def save_watermark(channel_id, mark):
+    with watermark_lock:
+        data = {}
+        if Path(WATERMARK_FILE).exists():
+            with open(WATERMARK_FILE, 'r') as f:
+                data = json.load(f) or {}
+        data[channel_id] = mark
+        tmp_file = f"{WATERMARK_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, WATERMARK_FILE)
+
+def needs_full_scan(mark):
+    # A sync cut short at end_index left a resume cursor; finishing that pass is the full scan
+    if mark and mark.get('resume_id'):
+        return False
+    return not mark or time.time() - mark.get('last_full_scan', 0) > FULL_RESCAN_DAYS * 86400
+
+def iter_incremental_urls(target_url, channel_id, max_retries, state, full_scan=False):
+    """Yield Shorts newer than the channel watermark, then stop paging
+
+    Playlists are newest-first, so enumeration ends at the previous newest ID,
+    or after WATERMARK_KNOWN_RUN consecutive entries already in the history
+    when that ID has disappeared from the playlist. If an earlier sync was cut
+    short, paging then skips ahead to its resume cursor and carries on from
+    there, down to the older watermark it left behind or the end of the
+    playlist. A full scan runs when forced, when there is no watermark yet, or
+    when the last one is older than FULL_RESCAN_DAYS. `state` receives the
+    candidate watermark; it is only committed through commit_watermark once the
+    run has handled every entry it yielded.
+    """
+    mark = load_watermark(channel_id)
+    full_scan = full_scan or needs_full_scan(mark)
+    resume_id = None if full_scan else mark.get('resume_id')
+    # Where the entries below a cut-short sync stop being new; None means the playlist end
+    resume_until = None if full_scan or resume_id else mark['newest_id']
+    state.update(full_scan=full_scan, complete=False, failed=False, newest_id=None, seen=0,
+                 last_id=None, resume_until=resume_until, reached_end=False, previous=mark)
+    if full_scan:
+        logging.info(f"Full scan for {channel_id}")
+    else:
+        logging.info(f"Incremental sync for {channel_id} since {mark['newest_id']}")
+
+    known_run = 0
+    skipping = False       # Between the watermark and the resume cursor: handled by earlier syncs
+    resuming = False       # Below the resume cursor
+    for url in iter_video_urls(target_url, max_retries, state):
+        video_id = extract_video_id(url)
+        if skipping:
+            if video_id == resume_id:
+                logging.info(f"Resuming {channel_id} below {video_id}")
+                skipping = False
+            continue
+        if resuming:
+            if video_id == state['resume_until']:
+                logging.info(f"Caught up with {channel_id} at {video_id}")
+                break
+        elif not full_scan:
+            reached = video_id == mark['newest_id']
+            known_run = known_run + 1 if is_video_downloaded(channel_id, video_id) else 0
+            if reached:
+                logging.info(f"Reached watermark {video_id} after {state['seen']} new entries")
+            elif known_run >= WATERMARK_KNOWN_RUN:
+                logging.warning(
+                    f"Watermark {mark['newest_id']} not found for {channel_id}; stopping after "
+                    f"{known_run} consecutive downloaded entries"
+                )
+            if reached or known_run >= WATERMARK_KNOWN_RUN:
+                if resume_id is None:
+                    break
+                skipping = resuming = True
+                state['resume_until'] = mark.get('resume_until')
+                continue
+        if state['newest_id'] is None and not resuming:
+            state['newest_id'] = video_id
+        state['seen'] += 1
+        state['last_id'] = video_id
+        yield url
+    else:
+        # Also when a resume cursor vanished: everything below the watermark was re-checked
+        state['reached_end'] = True
+
+    state['complete'] = True
+
+def commit_watermark(channel_id, state):
+    """Advance the watermark after a sync that handled everything it enumerated
+
+    A sync cut short at end_index (state['truncated']) commits too, with a
+    resume cursor at the last entry it handled, so the next sync carries on
+    below it instead of starting over from a full scan.
+    """
+    if state.get('failed') or not (state.get('complete') or state.get('truncated')):
+        return
+    mark = state.get('previous') or {}
+    now = time.time()
+    if state['full_scan']:
+        position = state['seen']
+    else:
+        position = mark.get('position', 0) + state['seen']
+    newest_id = state['newest_id'] or mark.get('newest_id')
+    entry = {'newest_id': newest_id, 'position': position, 'updated': now}
+    if not state.get('complete'):
+        entry['resume_id'] = state['last_id']
+        if state['resume_until']:
+            entry['resume_until'] = state['resume_until']
+        entry['last_full_scan'] = mark.get('last_full_scan', 0)
+        logging.info(f"Watermark for {channel_id} now {newest_id}, resuming below {state['last_id']}")
+    else:
+        # Any pass that paged to the end of the playlist counts as a full scan
+        entry['last_full_scan'] = now if state['reached_end'] else mark.get('last_full_scan', now)
+        logging.info(f"Watermark for {channel_id} now {newest_id} ({position} entries)")
+    save_watermark(channel_id, entry)
+
+# ---------------------------
+# Metadata prefetch
+# ---------------------------
+METADATA_PREFETCH = True
+METADATA_WORKERS = 8
+METADATA_CACHE_DIR = os.path.join(HISTORY_DIR, "metadata_cache")
+# Stream URLs in the info dict expire after roughly six hours
+METADATA_TTL = 3 * 3600
+LONG_VIDEO_TTL = 30 * 86400  # Duration-only entries that keep over-long videos skipped
+_metadata_pruned = threading.Event()
+
+
+def _metadata_cache_path(video_id):
+    return os.path.join(METADATA_CACHE_DIR, f"{video_id}.json")
+
+def load_cached_info(video_id):
+    """Cached info dict, or None when missing or stale
+
+    Over-long videos stay cached past METADATA_TTL (until LONG_VIDEO_TTL):
+    their duration never changes, so they need not be resolved again.
+    """
+    path = _metadata_cache_path(video_id)
+    if not video_id or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    info = cached.get('info') or {}
+    if not is_short_entry(info) or time.time() - cached.get('cached_at', 0) < METADATA_TTL:
+        return info
+    return None
+
+def save_cached_info(video_id, info):
+    os.makedirs(METADATA_CACHE_DIR, exist_ok=True)
+    # Private keys hold callables (e.g. __post_extractor) that cannot round-trip through JSON
+    info = load_yt_dlp().YoutubeDL.sanitize_info(
+        {k: v for k, v in info.items() if not k.startswith('__')}, remove_private_keys=False
+    )
+    # An over-long video is only ever looked up to be skipped again
+    stored = info if is_short_entry(info) else {'id': info.get('id'), 'duration': info.get('duration')}
+    path = _metadata_cache_path(video_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'cached_at': time.time(), 'info': stored}, f)
+    os.replace(tmp_path, path)
+    return info
+
+def forget_cached_info(video_id):
+    """Drop a video's entry once it is downloaded; the history skips it from then on"""
+    try:
+        os.remove(_metadata_cache_path(video_id))
+    except FileNotFoundError:
+        pass
+
+def prune_metadata_cache():
+    """Delete expired entries, at most once per process"""
+    if _metadata_pruned.is_set() or not os.path.isdir(METADATA_CACHE_DIR):
+        return
+    _metadata_pruned.set()
+    now = time.time()
+    removed = 0
+    with os.scandir(METADATA_CACHE_DIR) as entries:
+        for entry in entries:
+            try:
+                age = now - entry.stat().st_mtime
+                if age < METADATA_TTL:
+                    continue
+                if age < LONG_VIDEO_TTL:
+                    with open(entry.path, 'r') as f:
+                        if not is_short_entry(json.load(f).get('info') or {}):
+                            continue
+                os.remove(entry.path)
+                removed += 1
+            except (OSError, ValueError):
+                continue
+    if removed:
+        logging.info(f"Pruned {removed} expired metadata cache entries")
+
+def resolve_info(video_url, max_retries):
+    """Full info dict (duration, formats, title) for one video, via the disk cache
+
+    Returns (url, info); info is None if extraction failed, in which case the
+    download stage falls back to extracting from the URL itself.
+    """
+    video_id = extract_video_id(video_url)
+    info = load_cached_info(video_id)
+    if info is not None:
+        metrics.inc('metadata_cache_total', result='hit')
+        return video_url, info
+    metrics.inc('metadata_cache_total', result='miss')
+
+    ydl_opts = {
+        'quiet': True,
+        'skip_download': True,
+        'cookiefile': 'cookies.txt'
+    }
+    for retry in range(max_retries):
+        ydl = acquire_ydl(ydl_opts)
+        try:
+            throttle()
+            with metrics.timer('stage_seconds', stage='metadata'):
+                # process=False: format selection happens later, in the download handle
+                info = ydl.extract_info(video_url, download=False, process=False)
+            if info:
+                return video_url, save_cached_info(video_id or info.get('id'), info)
+        except Exception as e:
+            metrics.inc('retries_total', stage='metadata', cause=classify_error(e))
+            logging.warning(f"Metadata error for {video_url} (Attempt {retry + 1}/{max_retries}): {str(e)}")
+            time.sleep(min(2 ** retry, 5))
+        finally:
+            release_ydl(ydl)
+    return video_url, None
+
+def prefetch_metadata(video_urls, max_retries, workers=METADATA_WORKERS):
+    """Resolve info dicts concurrently, yielding (url, info) as they complete
+
+    At most 2 x workers lookups are in flight, so the prefetch stays a short
+    distance ahead of the download workers. Videos whose real duration is over
+    60 seconds are dropped here instead of being downloaded.
+    """
+    def accept(result):
+        url, info = result
+        if info is not None and not is_short_entry(info):
+            logging.info(f"Skipping {url}: {info.get('duration')}s is too long for a Short")
+            metrics.inc('videos_total', outcome='too_long')
+            return False
+        return True
+
+    prune_metadata_cache()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for url in video_urls:
+            pending.add(pool.submit(resolve_info, url, max_retries))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if accept(future.result()):
+                        yield future.result()
+        for future in as_completed(pending):
+            if accept(future.result()):
+                yield future.result()
 
 def get_video_range(total_shorts):
     """Get valid video range from user"""
@@ -166,11 +726,471 @@ def get_video_range(total_shorts):
 
     
 
-global channel_id
+# ---------------------------
+# Adaptive concurrency
+# ---------------------------
+ADAPTIVE_CONCURRENCY = True
+MAX_DOWNLOAD_WORKERS = 16     # Upper bound; the pool is sized to this
+MAX_FRAGMENT_DOWNLOADS = 16
+ADJUST_WINDOW = 15.0          # Seconds of observations per decision
+
+
+def classify_error(error):
+    """Coarse cause of a failed request, used for throttling and retry stats"""
+    text = str(error)
+    if '429' in text or 'Too Many Requests' in text:
+        return 'throttled'
+    if '403' in text or 'Forbidden' in text:
+        return 'forbidden'
+    if 'timed out' in text.lower() or 'timeout' in text.lower():
+        return 'timeout'
+    return 'other'
+
+
+class ConcurrencyController:
+    """AIMD tuning of active download workers and per-video fragment parallelism
+
+    Every ADJUST_WINDOW seconds the observed throughput and errors decide the
+    next limits: halve both on HTTP 429/403, back off on a high error rate,
+    otherwise probe upwards by one while throughput keeps improving and undo
+    the last step when it drops.
+    """
+
+    def __init__(self, workers=10, fragments=8, max_workers=MAX_DOWNLOAD_WORKERS,
+                 max_fragments=MAX_FRAGMENT_DOWNLOADS, window=ADJUST_WINDOW):
+        self.workers = workers
+        self.fragments = fragments
+        self.max_workers = max_workers
+        self.max_fragments = max_fragments
+        self.window = window
+        self.active = 0
+        self.cond = threading.Condition()
+        self.last_step = None
+        self.last_rate = 0.0
+        self._reset_window()
+
+    def _reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_ok = 0
+        self.window_errors = 0
+        self.window_throttled = 0
+
+    def acquire(self):
+        """Block until an active worker slot is free"""
+        with self.cond:
+            while self.active >= self.workers:
+                self.cond.wait()
+            self.active += 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def record(self, size, error=None):
+        with self.cond:
+            self.window_bytes += size
+            if error is None:
+                self.window_ok += 1
+            else:
+                self.window_errors += 1
+                if classify_error(error) in ('throttled', 'forbidden'):
+                    self.window_throttled += 1
+            if time.monotonic() - self.window_start >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        """Caller holds the condition lock"""
+        elapsed = time.monotonic() - self.window_start
+        rate = self.window_bytes / elapsed
+        attempts = self.window_ok + self.window_errors
+        error_rate = self.window_errors / attempts if attempts else 0.0
+
+        if self.window_throttled:
+            self.workers = max(1, self.workers // 2)
+            self.fragments = max(1, self.fragments // 2)
+            self.last_step = None
+            reason = f"throttled x{self.window_throttled}, halving"
+        elif error_rate > 0.2:
+            self.workers = max(1, self.workers * 3 // 4)
+            self.last_step = None
+            reason = f"error rate {error_rate:.0%}, backing off"
+        elif self.last_step and rate < self.last_rate * 0.95:
+            # The last probe made things worse; undo it
+            if self.last_step == 'workers':
+                self.workers = max(1, self.workers - 1)
+            else:
+                self.fragments = max(1, self.fragments - 1)
+            reason = f"throughput fell after raising {self.last_step}, reverting"
+            self.last_step = None
+        elif attempts:
+            # Alternate probing between workers and fragments
+            if self.last_step != 'workers' and self.workers < self.max_workers:
+                self.workers += 1
+                self.last_step = 'workers'
+            elif self.fragments < self.max_fragments:
+                self.fragments += 1
+                self.last_step = 'fragments'
+            else:
+                self.last_step = None
+            reason = f"probing {self.last_step}" if self.last_step else "at maximum"
+        else:
+            reason = "idle"
+
+        self.last_rate = rate
+        metrics.set('workers_total', self.workers, pool='download')
+        logging.info(
+            f"Concurrency: workers={self.workers} fragments={self.fragments} active={self.active} "
+            f"({reason}; {rate / 1e6:.2f} MB/s, {self.window_errors}/{attempts} errors)"
+        )
+        self._reset_window()
+        self.cond.notify_all()
+
+
+concurrency = ConcurrencyController() if ADAPTIVE_CONCURRENCY else None
+
+downloaded_bytes = 0
+
+def record_progress(status):
+    """yt_dlp progress hook: count bytes of every finished file"""
+    global downloaded_bytes
+    if status.get('status') == 'finished':
+        size = status.get('total_bytes') or status.get('downloaded_bytes') or 0
+        with download_lock:
+            downloaded_bytes += size
+        _ydl_local.attempt_bytes = getattr(_ydl_local, 'attempt_bytes', 0) + size
+        if status.get('filename'):
+            # A missing codec field means unknown, not absent
+            stream = status.get('info_dict') or {}
+            getattr(_ydl_local, 'finished_files', []).append(
+                (status['filename'], stream.get('vcodec') != 'none', stream.get('acodec') != 'none')
+            )
+        channel_stats = getattr(_ydl_local, 'channel_stats', None)
+        if channel_stats is not None:
+            with download_lock:
+                channel_stats['bytes'] += size
+
+# ---------------------------
+# Run manifest
+# ---------------------------
+MANIFEST_DIR_NAME = '.manifests'
+COMPACTED_MANIFEST = 'compacted.jsonl'  # Earlier runs' entries that may still be needed
+
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """JSON-lines record of the videos completed in this run
+
+    Every completed video gets one line with its ID, path, size and sha256, so
+    verification only looks at this run's files. Manifests of earlier runs in
+    the same folder are indexed and compacted so a restarted run can skip
+    finished files.
+    """
+
+    def __init__(self, download_path):
+        self.dir = os.path.join(download_path, MANIFEST_DIR_NAME)
+        os.makedirs(self.dir, exist_ok=True)
+        self.run_id = time.strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}"
+        self.path = os.path.join(self.dir, f"manifest_{self.run_id}.jsonl")
+        self.lock = threading.Lock()
+        self.entries = []
+        self.previous = self._load_previous()
+
+    def _load_previous(self):
+        """Index earlier runs' entries and fold them into one compacted file
+
+        Only entries whose file is still present and whose video is not in the
+        history yet can ever be skipped by find_completed; the rest are dropped,
+        so start-up reads one small file plus the runs since the last compaction.
+        """
+        names = sorted(name for name in os.listdir(self.dir) if name.endswith('.jsonl'))
+        # The compacted file holds the oldest entries; later runs override it
+        names.sort(key=lambda name: name != COMPACTED_MANIFEST)
+        previous = {}
+        for name in names:
+            with open(os.path.join(self.dir, name), 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    previous[entry['video_id']] = entry
+        store = get_history_store()
+        previous = {
+            video_id: entry for video_id, entry in previous.items()
+            if os.path.exists(entry['path']) and not store.contains(entry.get('channel_id'), video_id)
+        }
+        tmp_path = os.path.join(self.dir, COMPACTED_MANIFEST + '.tmp')
+        with open(tmp_path, 'w') as f:
+            for entry in previous.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, os.path.join(self.dir, COMPACTED_MANIFEST))
+        for name in names:
+            if name != COMPACTED_MANIFEST:
+                os.remove(os.path.join(self.dir, name))
+        return previous
+
+    def find_completed(self, video_id):
+        """Earlier manifest entry whose file is still present and intact"""
+        entry = self.previous.get(video_id)
+        if entry and os.path.exists(entry['path']) and os.path.getsize(entry['path']) == entry['size']:
+            return entry
+        return None
 
-def download_video(video_url, download_path, max_retries):
-    """Final merged version"""
-    global successful_downloads, failed_downloads, channel_id
+    def add(self, channel_id, video_id, path):
+        entry = {
+            'video_id': video_id,
+            'channel_id': channel_id,
+            'path': os.path.abspath(path),
+            'size': os.path.getsize(path),
+            'sha256': file_checksum(path),
+            'completed': time.time()
+        }
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+            self.entries.append(entry)
+        return entry
+
+    def verify(self):
+        """Check this run's files against their manifest entries: (ok, bad)"""
+        with self.lock:
+            entries = list(self.entries)
+        ok, bad = [], []
+        for entry in entries:
+            if os.path.exists(entry['path']) and os.path.getsize(entry['path']) == entry['size']:
+                ok.append(entry)
+            else:
+                bad.append(entry)
+                logging.error(f"Verification failed for {entry['video_id']}: {entry['path']}")
+        return ok, bad
+
+
+run_manifest = None
+
+def start_run_manifest(download_path):
+    global run_manifest
+    run_manifest = RunManifest(download_path)
+    logging.info(f"Run manifest: {run_manifest.path}")
+    return run_manifest
+
+CONTENT_DEDUP = True  # Drop downloads whose content is already in the same folder under another ID
+# Per download folder byte budget; only uploaded files are ever evicted, so a
+# full folder waits for the uploader. Leave None unless one drains the folder
+# and UPLOAD_CHANNELS names its channel (the pipeline daemon uses each upload
+# channel's storage_budget_bytes instead).
+DOWNLOAD_BUDGET_BYTES = None
+
+# Download folder -> upload channel_id it feeds. Eviction only counts uploads
+# to that channel, so files in folders not listed here are never evicted.
+UPLOAD_CHANNELS = {}
+
+# Called as listener(channel_id, video_id, path) for every finished video
+download_listeners = []
+
+# Set by a daemon shutting down: streaming syncs queue nothing more, skip what is
+# still queued and stop waiting for storage; the skipped entries stay new
+stop_requested = threading.Event()
+
+def was_uploaded(path):
+    """Storage eviction predicate: the folder's upload channel has this file's content"""
+    channel_id = UPLOAD_CHANNELS.get(os.path.normcase(os.path.abspath(os.path.dirname(path))))
+    return channel_id is not None and get_content_index().was_uploaded(path, channel_id)
+
+def drop_duplicate(channel_id, video_id, path):
+    """Delete a finished file whose content is already in its folder; True if dropped
+
+    Copies in other folders are kept: each folder is a different upload
+    channel, and reposting the same clip to several channels is intended.
+    """
+    try:
+        with metrics.timer('stage_seconds', stage='content_hash'):
+            _, existing = get_content_index().add_file(path, video_id, channel_id, same_folder=True)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Content hash failed for {path}: {str(e)}")
+        return False
+    if existing is None:
+        return False
+    logging.info(f"{video_id} duplicates {existing}; removing {path}")
+    get_content_index().forget(path)
+    os.remove(path)
+    return True
+
+def complete_download(channel_id, video_id, path):
+    """Record a finished video in the manifest, the history and the counters"""
+    global successful_downloads
+    work_queue = get_work_queue()
+    if CONTENT_DEDUP and path and os.path.exists(path) and drop_duplicate(channel_id, video_id, path):
+        # Still recorded in the history so the ID is never fetched again
+        mark_video_downloaded(channel_id, video_id)
+        forget_cached_info(video_id)
+        if work_queue is not None:
+            work_queue.complete(DOWNLOAD, channel_id, video_id)
+        metrics.inc('videos_total', outcome='duplicate')
+        return
+    if run_manifest is not None and path and os.path.exists(path):
+        run_manifest.add(channel_id, video_id, path)
+    mark_video_downloaded(channel_id, video_id)
+    forget_cached_info(video_id)
+    if work_queue is not None:
+        work_queue.complete(DOWNLOAD, channel_id, video_id)
+    with download_lock:
+        successful_downloads += 1
+    metrics.inc('videos_total', outcome='downloaded')
+    for listener in download_listeners:
+        try:
+            listener(channel_id, video_id, path)
+        except Exception as e:
+            logging.error(f"Download listener failed for {video_id}: {str(e)}", exc_info=True)
+
+def record_final_path(filepath):
+    """yt_dlp post hook: remember where the finished file ended up"""
+    _ydl_local.final_path = filepath
+
+# ---------------------------
+# Merge stage
+# ---------------------------
+SEPARATE_MERGE_STAGE = True
+MERGE_WORKERS = os.cpu_count() or 2
+MERGE_QUEUE_SIZE = MERGE_WORKERS * 2
+FFMPEG_BINARY = 'ffmpeg'
+
+# Raw streams are fetched as separate files and merged by the merge stage
+RAW_STREAM_FORMAT = '(bestvideo[height<=1080][ext=mp4][vcodec^=avc1],bestaudio[ext=m4a])/best[height<=1080][ext=mp4]'
+MERGED_FORMAT = 'bestvideo[height<=1080][ext=mp4][vcodec^=avc1]+bestaudio/best[height<=1080][ext=mp4]'
+
+
+def final_output_path(raw_file):
+    """title_id.f137.mp4 -> title_id.mp4"""
+    base = os.path.splitext(raw_file)[0]
+    return re.sub(r'\.f[\w-]+$', '', base) + '.mp4'
+
+def merge_streams(files, output_path):
+    """Merge or remux raw stream files into one MP4 without re-encoding"""
+    tmp_path = output_path + '.merging.mp4'
+    cmd = [FFMPEG_BINARY, '-y', '-hide_banner', '-loglevel', 'error']
+    for f in files:
+        cmd += ['-i', f]
+    for index in range(len(files)):
+        cmd += ['-map', str(index)]
+    cmd += ['-c', 'copy', '-movflags', '+faststart', tmp_path]
+    with metrics.timer('stage_seconds', stage='merge'):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr.strip()}")
+    os.replace(tmp_path, output_path)
+    for f in files:
+        if os.path.abspath(f) != os.path.abspath(output_path) and os.path.exists(f):
+            os.remove(f)
+
+
+class MergeStage:
+    """CPU-bound ffmpeg merges on their own pool, fed through a bounded queue
+
+    Network workers hand over raw stream files and go straight back to
+    downloading; when merges fall behind, submit() blocks and slows the
+    network side down instead of piling up raw files.
+    """
+
+    def __init__(self, workers=MERGE_WORKERS, queue_size=MERGE_QUEUE_SIZE):
+        metrics.set('workers_total', workers, pool='merge')
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.failures = {}  # channel_id -> merges that failed
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+        logging.info(f"Merge stage started with {workers} workers")
+
+    def submit(self, channel_id, video_id, files):
+        self.jobs.put((channel_id, video_id, files))
+
+    def _run(self):
+        global failed_downloads
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            channel_id, video_id, files = job
+            started = time.monotonic()
+            metrics.inc('workers_busy', pool='merge')
+            try:
+                output_path = final_output_path(files[0])
+                if len(files) == 1 and files[0].endswith('.mp4'):
+                    os.replace(files[0], output_path)
+                else:
+                    merge_streams(files, output_path)
+                complete_download(channel_id, video_id, output_path)
+            except Exception as e:
+                with download_lock:
+                    failed_downloads += 1
+                    self.failures[channel_id] = self.failures.get(channel_id, 0) + 1
+                metrics.inc('videos_total', outcome='merge_failed')
+                logging.error(f"Merge failed for {video_id}: {str(e)}")
+                if get_work_queue() is not None:
+                    get_work_queue().release(DOWNLOAD, channel_id, video_id)
+            finally:
+                metrics.inc('workers_busy', -1, pool='merge')
+                note_worker_time('merge', time.monotonic() - started)
+                self.jobs.task_done()
+
+    def drain(self):
+        """Wait until every merge submitted so far has finished"""
+        self.jobs.join()
+
+    def close(self):
+        """Wait for queued merges to finish"""
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+merge_stage = None
+
+def start_merge_stage():
+    global merge_stage
+    if SEPARATE_MERGE_STAGE and merge_stage is None:
+        merge_stage = MergeStage()
+
+def finish_merge_stage():
+    global merge_stage
+    if merge_stage is not None:
+        merge_stage.close()
+        merge_stage = None
+
+def download_merged(video_url, opts, partial_files):
+    """Replace an incomplete raw stream download with a yt_dlp-merged file"""
+    logging.warning(f"Only one raw stream available for {video_url}; downloading {MERGED_FORMAT} instead")
+    for path in partial_files:
+        if os.path.exists(path):
+            os.remove(path)
+    _ydl_local.final_path = None
+    ydl = acquire_ydl(opts)
+    try:
+        ydl.download([video_url])
+    finally:
+        release_ydl(ydl)
+    if not _ydl_local.final_path:
+        raise RuntimeError("merged download produced no file")
+
+def download_video(video_url, download_path, max_retries, channel_id, info=None):
+    """Final merged version; returns True once the video is in the history
+
+    A prefetched info dict skips yt_dlp's own extraction on the first attempt;
+    retries extract from the URL in case its stream URLs went stale.
+    """
+    global failed_downloads
 
     if not os.path.exists(download_path):
         os.makedirs(download_path, exist_ok=True)
@@ -179,12 +1199,22 @@ def download_video(video_url, download_path, max_retries):
     
     if is_video_downloaded(channel_id, video_id):
         logging.info(f"Skipping duplicate: {video_id}")
-        return
+        return True
+
+    if run_manifest is not None and run_manifest.find_completed(video_id):
+        logging.info(f"Already completed in an earlier run: {video_id}")
+        mark_video_downloaded(channel_id, video_id)
+        return True
+
+    work_queue = get_work_queue()
+    if work_queue is not None and not work_queue.claim(DOWNLOAD, channel_id, video_id):
+        logging.info(f"Skipping {video_id}: done or leased by another node")
+        return True
     
     download_opts = {
         'outtmpl': os.path.join(download_path, '%(title)s_%(id)s.%(ext)s'),
         # Optimized format selection for pre-merged files
-        'format': 'bestvideo[height<=1080][ext=mp4][vcodec^=avc1]+bestaudio/best[height<=1080][ext=mp4]',
+        'format': MERGED_FORMAT,
         'merge_output_format': 'mp4',
         'retries': max_retries,
         'fragment_retries': 2,
@@ -192,56 +1222,454 @@ def download_video(video_url, download_path, max_retries):
         'http_chunk_size': 10485760,  # 10MB chunks for faster downloads
         'noprogress': True,
         'nooverwrites': True,
-        'continuedl': False,
+        'continuedl': True,  # Keep .part files and resume them across retries and restarts
         'throttledratelimit': 0,
         'socket_timeout': 10,
         'verbose': False,
         'postprocessor_args': {'ffmpeg': ['-hide_banner', '-loglevel', 'error']},
         'windowsfilenames': False,
-        'restrictfilenames': False
+        'restrictfilenames': False,
+        'progress_hooks': [record_progress],
+        'post_hooks': [record_final_path]
     }
+    merged_opts = dict(download_opts)
+    if merge_stage is not None:
+        # Only fetch the raw streams here; merging happens on the merge pool
+        download_opts['format'] = RAW_STREAM_FORMAT
+        download_opts['outtmpl'] = os.path.join(download_path, '%(title)s_%(id)s.f%(format_id)s.%(ext)s')
+        del download_opts['merge_output_format']
 
+    # The first manager registered for a folder wins, e.g. the uploader's per channel budget
+    storage = get_storage_manager(download_path, DOWNLOAD_BUDGET_BYTES, was_uploaded)
+    if storage.budget_bytes:
+        # Blocks this worker (and through the bounded queue, the producer) while the folder is full
+        expected = (info or {}).get('filesize') or (info or {}).get('filesize_approx') or 0
+        with metrics.timer('stage_seconds', stage='storage_wait'):
+            has_space = storage.wait_for_space(expected, stop_event=stop_requested)
+        if not has_space:
+            if work_queue is not None:
+                work_queue.release(DOWNLOAD, channel_id, video_id)
+            return False
+
+    count_setup_video()
     for retry in range(max_retries):
+        if concurrency is not None:
+            concurrency.acquire()
+        ydl = acquire_ydl(download_opts)
+        _ydl_local.attempt_bytes = 0
+        _ydl_local.finished_files = []
+        _ydl_local.final_path = None
+        error = None
+        raw_files = None
+        started = time.monotonic()
+        metrics.inc('workers_busy', pool='download')
         try:
-            with yt_dlp.YoutubeDL(download_opts) as ydl:
-                ydl.download([video_url])
-                mark_video_downloaded(channel_id, video_id)
-                with download_lock:
-                    successful_downloads += 1
-                return
+            if concurrency is not None:
+                ydl.params['concurrent_fragment_downloads'] = concurrency.fragments
+            throttle()
+            with metrics.timer('stage_seconds', stage='media_download'):
+                if info is not None and retry == 0:
+                    ydl.process_ie_result(copy.deepcopy(info), download=True)
+                else:
+                    ydl.download([video_url])
+            elapsed = time.monotonic() - started
+            metrics.inc('bytes_total', _ydl_local.attempt_bytes)
+            if elapsed > 0:
+                metrics.observe('video_bytes_per_second', _ydl_local.attempt_bytes / elapsed)
+            if merge_stage is not None:
+                streams = _ydl_local.finished_files
+                if not streams:
+                    raise RuntimeError("yt_dlp reported no downloaded files")
+                if any(video for _, video, _ in streams) and any(audio for _, _, audio in streams):
+                    raw_files = list(dict.fromkeys(path for path, _, _ in streams))
+                else:
+                    # (video,audio)/muxed accepts the group when only one side matched
+                    download_merged(video_url, merged_opts, [path for path, _, _ in streams])
+                    complete_download(channel_id, video_id, _ydl_local.final_path)
+                    return True
+            else:
+                complete_download(channel_id, video_id, _ydl_local.final_path)
+                return True
         except Exception as e:
+            error = e
+            metrics.inc('retries_total', stage='media_download', cause=classify_error(e))
             if retry == max_retries - 1:
                 with download_lock:
                     failed_downloads += 1
+                metrics.inc('videos_total', outcome='failed')
                 logging.error(f"Failed {video_url}: {str(e)}")
+        finally:
+            metrics.inc('workers_busy', -1, pool='download')
+            note_worker_time('download', time.monotonic() - started)
+            release_ydl(ydl)
+            if concurrency is not None:
+                concurrency.record(_ydl_local.attempt_bytes, error)
+                concurrency.release()
+        if raw_files:
+            # Hand off after releasing the worker slot so merges never hold network capacity
+            merge_stage.submit(channel_id, video_id, raw_files)
+            return True
+        # Back off outside the worker slot
+        if retry < max_retries - 1:
             time.sleep(min(2 ** retry, 5))
-    
-            
-        except Exception as e:
-            retries += 1
-            logging.error(f"Download attempt {retries} failed for {video_url}: {str(e)}")
-            time.sleep(min(2 ** retries, 15))
+    if work_queue is not None:
+        work_queue.release(DOWNLOAD, channel_id, video_id)
+    return False
 
-    with download_lock:
-        failed_downloads += 1
-    logging.error(f"Permanent failure for {video_url}")
+STREAM_QUEUE_SIZE = 50  # Bounded hand-off between playlist paging and download workers
 
-    # Update counters
-    with download_lock:
-        if actually_downloaded:
-            successful_downloads += 1
+def stream_downloads(target_url, channel_id, download_path, max_threads, max_retries,
+                     start_index=0, end_index=None, queue_size=STREAM_QUEUE_SIZE,
+                     incremental=False, full_scan=False, prefetch=None):
+    """Download new Shorts while the playlist is still being paged in
+
+    Entries are filtered against the channel history as they arrive and pushed
+    through a bounded queue, so workers start on the first new Short and memory
+    stays flat regardless of channel size. start_index/end_index select a range
+    of the *new* Shorts in playlist order. With incremental=True paging stops at
+    the channel watermark, which advances only if the whole sync succeeded.
+    With prefetch (default METADATA_PREFETCH) full metadata is resolved
+    concurrently between paging and downloading. Returns (found, queued) counts.
+    """
+    if prefetch is None:
+        prefetch = METADATA_PREFETCH
+    work = queue.Queue(maxsize=queue_size)
+    counts = {'found': 0, 'new': 0, 'queued': 0}
+    sync_state = {}
+    failures_before = failed_downloads
+
+    def new_urls(urls):
+        for url in urls:
+            if stop_requested.is_set():
+                return
+            counts['found'] += 1
+            if is_video_downloaded(channel_id, extract_video_id(url)):
+                continue
+            position = counts['new']
+            counts['new'] += 1
+            if position < start_index:
+                continue
+            yield url
+            if end_index is not None and position >= end_index:
+                # The rest of the playlist is left for the next sync (see commit_watermark)
+                sync_state['truncated'] = True
+                return
+
+    def produce():
+        if incremental:
+            urls = iter_incremental_urls(target_url, channel_id, max_retries, sync_state, full_scan)
         else:
-            failed_downloads += 1
-            logging.error(f"Permanent failure for {video_url}")
+            urls = iter_video_urls(target_url, max_retries)
+        if prefetch:
+            jobs = prefetch_metadata(new_urls(urls), max_retries)
+        else:
+            jobs = ((url, None) for url in new_urls(urls))
+        try:
+            for job in jobs:
+                work.put(job)  # Blocks while workers are behind
+                counts['queued'] += 1
+        except Exception as e:
+            sync_state['failed'] = True
+            logging.error(f"Playlist producer error: {str(e)}", exc_info=True)
+        finally:
+            for _ in range(max_threads):
+                work.put(None)
+
+    def consume(pbar):
+        global failed_downloads
+        while True:
+            job = work.get()
+            if job is None:
+                return
+            if stop_requested.is_set():
+                continue
+            url, info = job
+            try:
+                download_video(url, download_path, max_retries, channel_id, info)
+            except Exception as e:
+                logging.error(f"Thread error: {str(e)}", exc_info=True)
+                with download_lock:
+                    failed_downloads += 1
+            pbar.update(1)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    from tqdm import tqdm
+    with tqdm(desc="Downloading", unit="video") as pbar:
+        producer.start()
+        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+            for _ in range(max_threads):
+                executor.submit(consume, pbar)
+        producer.join()
+
+    # Skipped or failed entries would be hidden behind an advanced watermark;
+    # queued merges can still fail, so they must finish before that is known
+    if merge_stage is not None:
+        merge_stage.drain()
+    # A shutdown skips queued entries, so they must stay above the watermark
+    if incremental and start_index == 0 and failed_downloads == failures_before and not stop_requested.is_set():
+        commit_watermark(channel_id, sync_state)
+
+    logging.info(
+        f"Streamed {counts['found']} entries, {counts['new']} new, {counts['queued']} queued"
+    )
+    # This call's producer and worker threads are gone; so is any use for their handles
+    close_ydl_pool(finished_only=True)
+    return counts['found'], counts['queued']
+
+# ---------------------------
+# Batch mode
+# ---------------------------
+BATCH_ENUMERATORS = 4       # Channels fetching playlist pages at the same time
+BATCH_CHANNEL_QUEUE = 20    # Pending downloads buffered per channel
+
+
+class FairScheduler:
+    """Per-channel queues served round-robin to one shared worker pool
+
+    Each channel gets a bounded queue, so a huge channel's producer blocks
+    instead of flooding the pool, and workers rotate across channels so no
+    channel waits behind another one's backlog.
+    """
+
+    def __init__(self, per_channel_limit=BATCH_CHANNEL_QUEUE):
+        self.per_channel_limit = per_channel_limit
+        self.queues = {}
+        self.open_channels = set()
+        self.order = []
+        self.next_index = 0
+        self.cond = threading.Condition()
+
+    def register(self, channel_id):
+        with self.cond:
+            self.queues[channel_id] = deque()
+            self.open_channels.add(channel_id)
+            self.order.append(channel_id)
+
+    def put(self, channel_id, item):
+        with self.cond:
+            while len(self.queues[channel_id]) >= self.per_channel_limit:
+                self.cond.wait()
+            self.queues[channel_id].append(item)
+            self.cond.notify_all()
+
+    def close(self, channel_id):
+        with self.cond:
+            self.open_channels.discard(channel_id)
+            self.cond.notify_all()
+
+    def get(self):
+        """Next (channel_id, item) in round-robin order, or None when drained"""
+        with self.cond:
+            while True:
+                for offset in range(len(self.order)):
+                    index = (self.next_index + offset) % len(self.order)
+                    channel_id = self.order[index]
+                    if self.queues[channel_id]:
+                        self.next_index = index + 1
+                        item = self.queues[channel_id].popleft()
+                        self.cond.notify_all()
+                        return channel_id, item
+                if not self.open_channels:
+                    return None
+                self.cond.wait()
+
+
+def load_channel_list(list_file):
+    """Channel URLs, one per line; blank lines and # comments are ignored"""
+    with open(list_file, 'r') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def run_batch(channel_urls, download_root, max_threads, max_retries, incremental=False,
+              rate=RATE_LIMIT_PER_SEC, burst=RATE_LIMIT_BURST):
+    """Enumerate and download many channels through one shared worker pool
+
+    Every channel downloads into its own sub-folder of download_root. All
+    metadata and media requests draw from one token bucket. Returns per-channel
+    stats and prints aggregate throughput.
+    """
+    global rate_limiter
+    rate_limiter = TokenBucket(rate, burst)
+    scheduler = FairScheduler()
+    enumerators = threading.Semaphore(BATCH_ENUMERATORS)
+    stats = {}
+    channels = []
+
+    for channel_url in channel_urls:
+        try:
+            channel_id = get_channel_id(channel_url)
+        except AttributeError:
+            # e.g. /c/Name or /user/x; one bad line must not stop the other channels
+            logging.error(f"Skipping {channel_url}: not a /channel/ or @handle URL")
+            print(f"\033[91mSkipping {channel_url}: not a /channel/ or @handle URL\033[0m")
+            continue
+        if channel_id in stats:
+            continue
+        stats[channel_id] = {'found': 0, 'queued': 0, 'done': 0, 'failed': 0, 'bytes': 0}
+        scheduler.register(channel_id)
+        channels.append((channel_id, validate_url(channel_url)))
+
+    def limited(urls):
+        """Hold an enumerator slot only while pulling the next entry (i.e. fetching a page)"""
+        iterator = iter(urls)
+        while True:
+            with enumerators:
+                url = next(iterator, _END)
+            if url is _END:
+                return
+            yield url
+
+    def produce(channel_id, target_url):
+        # Every channel enumerates into its own bounded queue; a full queue
+        # blocks only this producer, never another channel's page fetches
+        sync_state = {}
+        try:
+            if incremental:
+                urls = iter_incremental_urls(target_url, channel_id, max_retries, sync_state)
+            else:
+                urls = iter_video_urls(target_url, max_retries)
+            def new_urls():
+                for url in limited(urls):
+                    stats[channel_id]['found'] += 1
+                    if not is_video_downloaded(channel_id, extract_video_id(url)):
+                        yield url
+
+            if METADATA_PREFETCH:
+                jobs = prefetch_metadata(new_urls(), max_retries)
+            else:
+                jobs = ((url, None) for url in new_urls())
+            for job in jobs:
+                scheduler.put(channel_id, job)
+                stats[channel_id]['queued'] += 1
+        except Exception as e:
+            logging.error(f"Playlist producer error for {channel_id}: {str(e)}", exc_info=True)
+        finally:
+            scheduler.close(channel_id)
+        return sync_state
+
+    def consume(pbar):
+        while True:
+            job = scheduler.get()
+            if job is None:
+                return
+            channel_id, (url, info) = job
+            channel_stats = stats[channel_id]
+            _ydl_local.channel_stats = channel_stats
+            try:
+                ok = download_video(url, os.path.join(download_root, channel_id), max_retries, channel_id, info)
+            except Exception as e:
+                logging.error(f"Thread error: {str(e)}", exc_info=True)
+                ok = False
+            with download_lock:
+                channel_stats['done' if ok else 'failed'] += 1
+            pbar.update(1)
+
+    started = time.monotonic()
+    bytes_before = downloaded_bytes
+    merge_failures_before = dict(merge_stage.failures) if merge_stage is not None else {}
+    from tqdm import tqdm
+    with tqdm(desc="Downloading", unit="video") as pbar:
+        with ThreadPoolExecutor(max_workers=len(channels) or 1) as producers, \
+                ThreadPoolExecutor(max_workers=max_threads) as workers:
+            sync_futures = {
+                channel_id: producers.submit(produce, channel_id, target_url)
+                for channel_id, target_url in channels
+            }
+            for _ in range(max_threads):
+                workers.submit(consume, pbar)
+    if merge_stage is not None:
+        # A video counts as done when its merge was queued; move failed merges over
+        merge_stage.drain()
+        for channel_id, channel_stats in stats.items():
+            merge_failed = merge_stage.failures.get(channel_id, 0) - merge_failures_before.get(channel_id, 0)
+            channel_stats['done'] -= merge_failed
+            channel_stats['failed'] += merge_failed
+    elapsed = max(time.monotonic() - started, 1e-6)
+
+    if incremental:
+        for channel_id, future in sync_futures.items():
+            if stats[channel_id]['failed'] == 0:
+                commit_watermark(channel_id, future.result())
+
+    total_done = sum(s['done'] for s in stats.values())
+    total_bytes = downloaded_bytes - bytes_before
+    print(f"\n\033[1m{'='*40}")
+    print("Batch Summary:")
+    for channel_id, s in stats.items():
+        print(f"{channel_id}: {s['done']} downloaded, {s['failed']} failed, "
+              f"{s['queued']} new of {s['found']} found, {s['bytes'] / 1e6:.1f} MB")
+    print(f"Channels: {len(stats)}  Videos: {total_done}  Time: {elapsed:.1f}s")
+    print(f"Throughput: {total_done / elapsed:.2f} videos/s, {total_bytes / elapsed / 1e6:.2f} MB/s")
+    print(f"{'='*40}\033[0m")
+    logging.info(
+        f"Batch report - Channels: {len(stats)}, Videos: {total_done}, "
+        f"Bytes: {total_bytes}, Seconds: {elapsed:.1f}"
+    )
+    close_ydl_pool(finished_only=True)
+    return stats
+
+def run_download_job(channel_url, download_path, max_threads, max_retries,
+                     start_index=0, end_index=None, incremental=False, full_scan=False):
+    """Non-interactive single-channel download; returns a summary dict"""
+    global successful_downloads, failed_downloads
+    os.makedirs(download_path, exist_ok=True)
+    successful_downloads = 0
+    failed_downloads = 0
+    channel_id = get_channel_id(channel_url)
+    target_url = validate_url(channel_url)
+    logging.info(f"Job download started for {target_url} into {download_path}")
+    start_run_manifest(download_path)
+    start_merge_stage()
+    found, queued = stream_downloads(
+        target_url, channel_id, download_path, max_threads, max_retries,
+        start_index=start_index, end_index=end_index, incremental=incremental, full_scan=full_scan
+    )
+    finish_merge_stage()
+    verified, corrupt = run_manifest.verify()
+    summary = {
+        'channel_id': channel_id, 'found': found, 'queued': queued,
+        'succeeded': successful_downloads, 'failed': failed_downloads,
+        'verified': len(verified), 'corrupt': len(corrupt),
+        'bytes': sum(entry['size'] for entry in verified)
+    }
+    logging.info(f"Job download report - {summary}")
+    return summary
+
 
-    
 if __name__ == "__main__":
+    from tqdm import tqdm
+
     # Get user inputs
-    channel_url = input("\nEnter YouTube channel URL: ").strip()
+    channel_url = input("\nEnter YouTube channel URL (or a channel list file for batch mode): ").strip()
     download_path = input("Enter download path: ").strip()
     os.makedirs(download_path, exist_ok=True)
-    max_threads = 10
+    # With adaptive concurrency the pool is sized to the upper bound and the
+    # controller decides how many workers are active at once
+    max_threads = concurrency.max_workers if concurrency is not None else 10
     max_retries = 3
+
+    metrics.set('workers_total', concurrency.workers if concurrency is not None else max_threads, pool='download')
+    if METRICS_PORT:
+        serve_metrics(metrics, METRICS_PORT)
+    stop_metrics_dump = start_json_dump(
+        metrics, os.path.join(download_path, 'downloader_metrics.json'), METRICS_DUMP_INTERVAL
+    )
+
+    if os.path.isfile(channel_url):
+        incremental = input("Only sync Shorts newer than the last run? (y/n): ").strip().lower() == 'y'
+        start_run_manifest(download_path)
+        start_merge_stage()
+        run_batch(load_channel_list(channel_url), download_path, max_threads, max_retries, incremental)
+        finish_merge_stage()
+        verified, corrupt = run_manifest.verify()
+        print(f"Verified files this run: {len(verified)}, failed verification: {len(corrupt)}")
+        get_history_store().close()
+        close_content_index()
+        close_work_queue()
+        close_ydl_pool()
+        print(setup_overhead_report())
+        stop_metrics_dump()
+        exit()
+
     # Channel tracking setup
     channel_id = get_channel_id(channel_url)
     
@@ -263,80 +1691,108 @@ if __name__ == "__main__":
     print(f"\n\033[1mDownload path: {os.path.abspath(download_path)}\033[0m")
     print(f"\033[1mUsing processed URL:\033[0m {target_url}")
 
-    # Fetch video URLs
-    video_urls = fetch_video_urls(target_url, max_retries)
+    stream_mode = input("Start downloading while the playlist is still loading? (y/n): ").strip().lower() == 'y'
+    successful_downloads = 0
+    failed_downloads = 0
+    start_run_manifest(download_path)
+    start_merge_stage()
+
+    if stream_mode:
+        start_index = int(input("Skip how many new shorts (0 for none): ").strip() or 0)
+        limit = input("Download how many new shorts (blank for all): ").strip()
+        end_index = start_index + int(limit) - 1 if limit else None
+        incremental = input("Only sync Shorts newer than the last run? (y/n): ").strip().lower() == 'y'
+
+        print("\n\033[1mStreaming new Shorts...\033[0m")
+        found_count, selected_count = stream_downloads(
+            target_url, channel_id, download_path, max_threads, max_retries,
+            start_index=start_index, end_index=end_index, incremental=incremental
+        )
+        print(f"\nFound {found_count} potential shorts, {selected_count} new shorts queued")
+        selected_urls = []
+    else:
+        # Fetch video URLs
+        video_urls = fetch_video_urls(target_url, max_retries)
     
-    # Add debug output
-    print(f"\nFound {len(video_urls)} potential shorts (before filtering)")
-    logging.info(f"Initial video URLs found: {len(video_urls)}")
+        # Add debug output
+        print(f"\nFound {len(video_urls)} potential shorts (before filtering)")
+        logging.info(f"Initial video URLs found: {len(video_urls)}")
 
-    # Filter for channel history
-    video_urls = filter_new_videos(channel_id, video_urls)
-    print(f"After filtering: {len(video_urls)} new shorts available")
+        # Filter for channel history
+        video_urls = filter_new_videos(channel_id, video_urls)
+        print(f"After filtering: {len(video_urls)} new shorts available")
 
-    if not video_urls:
-        print("\n\033[92mNo new videos found for this channel!\033[0m")
-        exit()
+        if not video_urls:
+            print("\n\033[92mNo new videos found for this channel!\033[0m")
+            exit()
 
-    # Get download range
-    total_shorts = len(video_urls)
-    start_index, end_index = get_video_range(total_shorts)
-    selected_urls = video_urls[start_index:end_index + 1]
-    selected_count = len(selected_urls)
-
-    # Final confirmation
-    print(f"\n\033[1mAbout to download {selected_count} Shorts:\033[0m")
-    confirm = input(f"Proceed with download? (y/n): ").strip().lower()
-    if confirm != 'y':
-        print("\n\033[91mDownload canceled.\033[0m")
-        exit()
+        # Get download range
+        total_shorts = len(video_urls)
+        start_index, end_index = get_video_range(total_shorts)
+        selected_urls = video_urls[start_index:end_index + 1]
+        selected_count = len(selected_urls)
 
-    successful_downloads = 0
-    failed_downloads = 0
+        # Final confirmation
+        print(f"\n\033[1mAbout to download {selected_count} Shorts:\033[0m")
+        confirm = input(f"Proceed with download? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("\n\033[91mDownload canceled.\033[0m")
+            exit()
 
-    # Start download process with enhanced monitoring
-    print(f"\n\033[1mStarting download of {selected_count} Shorts...\033[0m")
-    with tqdm(total=selected_count, desc="Downloading", unit="video") as pbar:
-        with ThreadPoolExecutor(max_workers=max_threads) as executor:
-            futures = []
-            for url in selected_urls:
-                futures.append(executor.submit(
-                    download_video, 
-                    url,
-                    # Pass explicit parameters instead of relying on globals
-                    download_path,
-                    max_retries
-                ))
-                pbar.update(0)  # Initial progress update
+        # Start download process with enhanced monitoring
+        print(f"\n\033[1mStarting download of {selected_count} Shorts...\033[0m")
+        with tqdm(total=selected_count, desc="Downloading", unit="video") as pbar:
+            with ThreadPoolExecutor(max_workers=max_threads) as executor:
+                futures = []
+                # Downloads start as soon as each video's metadata is resolved
+                if METADATA_PREFETCH:
+                    jobs = prefetch_metadata(selected_urls, max_retries)
+                else:
+                    jobs = ((url, None) for url in selected_urls)
+                for url, info in jobs:
+                    futures.append(executor.submit(
+                        download_video, 
+                        url,
+                        # Pass explicit parameters instead of relying on globals
+                        download_path,
+                        max_retries,
+                        channel_id,
+                        info
+                    ))
+                    pbar.update(0)  # Initial progress update
             
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    logging.error(f"Thread error: {str(e)}", exc_info=True )
-                    with download_lock:
-                       failed_downloads += 1
-
-    # Final verification
-    actual_downloads = len([
-        f for f in os.listdir(download_path)
-        if f.endswith('.mp4') and os.path.getsize(os.path.join(download_path, f)) > 0
-    ])
-    
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logging.error(f"Thread error: {str(e)}", exc_info=True )
+                        with download_lock:
+                           failed_downloads += 1
+
+    # Let queued merges finish before counting files
+    finish_merge_stage()
+
+    # Final verification against this run's manifest
+    verified, corrupt = run_manifest.verify()
+    actual_downloads = len(verified)
+
     # Display final report
     print(f"\n\033[1m{'='*40}")
     print(f"Download Summary:")
     print(f"Selected Shorts: {selected_count}")
     print(f"Reported Successes: {successful_downloads}")
     print(f"Reported Failures: {failed_downloads}")
-    print(f"Actual MP4 files in directory: {actual_downloads}")
+    print(f"Verified files this run: {actual_downloads} ({sum(e['size'] for e in verified) / 1e6:.1f} MB)")
+    print(f"Failed verification: {len(corrupt)}")
+    print(f"Manifest: {run_manifest.path}")
     print(f"{'='*40}\033[0m")
 
     logging.info(
         f"Final report - Selected: {selected_count}, "
         f"Success: {successful_downloads}, "
         f"Failed: {failed_downloads}, "
-        f"Actual files: {actual_downloads}"
+        f"Verified files: {actual_downloads}, "
+        f"Failed verification: {len(corrupt)}"
     )
 
     # Update channel history only with verified downloads
@@ -347,3 +1803,11 @@ if __name__ == "__main__":
             downloaded_ids.append(vid)
     
     update_channel_history(channel_id, downloaded_ids)
+    get_history_store().close()
+    close_content_index()
+    close_work_queue()
+
+    close_ydl_pool()
+    print(setup_overhead_report())
+    logging.info(setup_overhead_report())
+    stop_metrics_dump()
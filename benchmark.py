@@ -0,0 +1,692 @@
+"""Offline throughput benchmarks for the downloader and uploader
+
+Runs everything against a local HTTP stand-in instead of YouTube:
+
+  /feed.xml                 synthetic channel playlist (RSS, one item per video)
+  /media/<id>.mp4           fixture media with tunable latency and bandwidth; every
+                            video is distinct unless --duplicate-every re-serves the
+                            previous video's bytes under a new ID
+  /discovery/youtube/v3     discovery document pointing the API client here
+  /upload/youtube/v3/videos fake videos().insert (simple and resumable uploads)
+  /token                    OAuth token endpoint for refresh_token grants
+
+Inserts are charged against an optional per-project quota (the ?key= parameter)
+and rejected with 403 quotaExceeded once it is spent.
+
+Usage:
+  python benchmark.py                         # history, download and upload
+  python benchmark.py --only history --history-sizes 1000,10000,100000
+  python benchmark.py --videos 200 --media-size 2000000 --latency 0.05 --bandwidth 5000000
+  python benchmark.py --only prepare --prepare-clips 16   # needs ffmpeg on PATH
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_CHANNEL = "bench"
+
+
+def video_ids(count):
+    return [f"v{index:010d}" for index in range(count)]
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ---------------------------
+# Local stand-in server
+# ---------------------------
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # yt_dlp closes probe requests after reading the first bytes
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class StandIn:
+    """Synthetic channel, media and upload API served from 127.0.0.1"""
+
+    def __init__(self, videos=100, media_size=1_000_000, latency=0.0, bandwidth=0, quota=None, quota_cost=1600,
+                 duplicate_every=0):
+        self.videos = videos
+        self.media = os.urandom(media_size)
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes/s per response, 0 = unlimited
+        self.quota = quota          # units per client_id, None = unlimited
+        self.quota_cost = quota_cost
+        self.quota_used = {}
+        self.quota_rejections = 0
+        self.duplicate_every = duplicate_every
+        self.sessions = {}
+        self.uploads = []
+        self.lock = threading.Lock()
+        self.server = QuietServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def feed(self):
+        items = "".join(
+            f"<item><title>Short {vid}</title><link>{self.base_url}/media/{vid}.mp4</link>"
+            f"<guid>{vid}</guid></item>"
+            for vid in video_ids(self.videos)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{BENCH_CHANNEL}</title><link>{self.base_url}/</link>{items}</channel></rss>"
+        )
+
+    def discovery(self):
+        return {
+            "kind": "discovery#restDescription",
+            "discoveryVersion": "v1",
+            "id": "youtube:v3",
+            "name": "youtube",
+            "version": "v3",
+            "rootUrl": f"{self.base_url}/",
+            "servicePath": "youtube/v3/",
+            "baseUrl": f"{self.base_url}/youtube/v3/",
+            "batchPath": "batch/youtube",
+            "parameters": {},
+            "schemas": {
+                "Video": {"id": "Video", "type": "object", "properties": {"id": {"type": "string"}}}
+            },
+            "resources": {
+                "videos": {
+                    "methods": {
+                        "insert": {
+                            "id": "youtube.videos.insert",
+                            "path": "videos",
+                            "httpMethod": "POST",
+                            "parameters": {
+                                "part": {"type": "string", "required": True, "repeated": True, "location": "query"}
+                            },
+                            "parameterOrder": ["part"],
+                            "request": {"$ref": "Video"},
+                            "response": {"$ref": "Video"},
+                            "supportsMediaUpload": True,
+                            "mediaUpload": {
+                                "accept": ["video/*", "application/octet-stream"],
+                                "maxSize": "256GB",
+                                "protocols": {
+                                    "simple": {"multipart": True, "path": "/upload/youtube/v3/videos"},
+                                    "resumable": {"multipart": True, "path": "/resumable/upload/youtube/v3/videos"}
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+    def media_for(self, video_id):
+        """Fixture bytes for a video, stamped with its ID unless it is a re-upload"""
+        index = int(video_id[1:]) if video_id[1:].isdigit() else 0
+        if self.duplicate_every and index % self.duplicate_every == self.duplicate_every - 1:
+            index -= 1
+        stamp = f"{index:016d}".encode()
+        return stamp + self.media[len(stamp):]
+
+    def charge_quota(self, client_id):
+        """Charge one insert like the real API; returns an error response once spent"""
+        if self.quota is None:
+            return None
+        with self.lock:
+            used = self.quota_used.get(client_id, 0)
+            if used + self.quota_cost > self.quota:
+                self.quota_rejections += 1
+                return 403, {"error": {"code": 403, "message": "The request cannot be completed because you have exceeded your quota.",
+                                       "errors": [{"reason": "quotaExceeded", "domain": "youtube.quota"}]}}
+            self.quota_used[client_id] = used + self.quota_cost
+        return None
+
+    def insert_video(self, size):
+        """Bookkeeping hook for a completed videos().insert"""
+        with self.lock:
+            video_id = f"u{len(self.uploads):010d}"
+            self.uploads.append((video_id, size))
+        return video_id
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="application/json", headers=None):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode()
+                elif isinstance(body, str):
+                    body = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _stream_media(self, video_id):
+                data = stand_in.media_for(video_id)
+                start, end = 0, len(data) - 1
+                match = re.match(r"bytes=(\d*)-(\d*)", self.headers.get("Range") or "")
+                status = 200
+                if match:
+                    status = 206
+                    start = int(match.group(1) or 0)
+                    end = min(int(match.group(2)) if match.group(2) else end, len(data) - 1)
+                self.send_response(status)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.end_headers()
+                if self.command == "HEAD":
+                    return
+                chunk = 64 * 1024
+                for offset in range(start, end + 1, chunk):
+                    piece = data[offset:min(offset + chunk, end + 1)]
+                    self.wfile.write(piece)
+                    if stand_in.bandwidth:
+                        time.sleep(len(piece) / stand_in.bandwidth)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                path = urlparse(self.path).path
+                if path == "/feed.xml":
+                    self._send(200, stand_in.feed(), "application/rss+xml")
+                elif path.startswith("/media/"):
+                    self._stream_media(os.path.splitext(os.path.basename(path))[0])
+                elif path.startswith("/discovery/youtube/v3"):
+                    self._send(200, stand_in.discovery())
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                body = self._body()
+                if url.path == "/token":
+                    self._send(200, {"access_token": f"bench-{random.getrandbits(32):08x}",
+                                     "expires_in": 3600, "token_type": "Bearer"})
+                    return
+                if url.path != "/upload/youtube/v3/videos":
+                    self._send(404, {"error": "not found"})
+                    return
+                # Quota is charged when the insert starts, per API key or OAuth client
+                quota_error = stand_in.charge_quota(query.get("key", ["default"])[0])
+                if quota_error:
+                    self._send(*quota_error)
+                    return
+                upload_type = query.get("uploadType", ["simple"])[0]
+                if upload_type == "resumable":
+                    size = int(self.headers.get("X-Upload-Content-Length") or 0)
+                    session = f"{len(stand_in.sessions)}-{random.getrandbits(32):08x}"
+                    with stand_in.lock:
+                        stand_in.sessions[session] = {"size": size, "received": 0}
+                    self._send(200, {}, headers={"Location": f"{stand_in.base_url}/upload/session/{session}"})
+                    return
+                result = stand_in.insert_video(len(body))
+                if isinstance(result, tuple):
+                    self._send(*result)
+                else:
+                    self._send(200, {"id": result, "kind": "youtube#video"})
+
+            def do_PUT(self):
+                url = urlparse(self.path)
+                session_id = url.path.rsplit("/", 1)[-1]
+                session = stand_in.sessions.get(session_id)
+                body = self._body()
+                if session is None:
+                    self._send(404, {"error": "unknown upload session"})
+                    return
+                content_range = self.headers.get("Content-Range") or ""
+                status_query = re.match(r"bytes \*/(\d+|\*)", content_range)
+                chunk = re.match(r"bytes (\d+)-(\d+)/(\d+|\*)", content_range)
+                if chunk:
+                    session["received"] = int(chunk.group(2)) + 1
+                    if chunk.group(3) != "*":
+                        session["size"] = int(chunk.group(3))
+                elif not status_query:
+                    session["received"] += len(body)
+                    session["size"] = session["size"] or session["received"]
+                if session["size"] and session["received"] >= session["size"]:
+                    result = stand_in.insert_video(session["size"])
+                    if isinstance(result, tuple):
+                        self._send(*result)
+                    else:
+                        self._send(200, {"id": result, "kind": "youtube#video"})
+                    return
+                headers = {"Range": f"bytes=0-{session['received'] - 1}"} if session["received"] else {}
+                self._send(308, b"", "text/plain", headers)
+
+        return Handler
+
+
+# ---------------------------
+# Benchmarks
+# ---------------------------
+
+def bench_history(scrapper, sizes, workdir, lookups=10000, writes=1000):
+    """History load, lookup, filter and write cost at several history sizes"""
+    results = []
+    for size in sizes:
+        for backend in ("json", "sqlite"):
+            folder = os.path.join(workdir, f"history_{backend}_{size}")
+            os.makedirs(folder, exist_ok=True)
+            json_file = os.path.join(folder, "channel_history.json")
+            db_file = os.path.join(folder, "channel_history.db") if backend == "sqlite" else None
+            known = video_ids(size)
+            with open(json_file, "w") as f:
+                json.dump({BENCH_CHANNEL: known}, f)
+
+            # Legacy cost: one json.load of the whole file per membership test
+            start = time.perf_counter()
+            for _ in range(5):
+                with open(json_file, "r") as f:
+                    _ = known[0] in json.load(f).get(BENCH_CHANNEL, [])
+            legacy_lookup = (time.perf_counter() - start) / 5
+
+            start = time.perf_counter()
+            store = scrapper.HistoryStore(json_file, db_file)
+            store.contains(BENCH_CHANNEL, known[0])
+            load_seconds = time.perf_counter() - start
+
+            probes = [random.choice(known) for _ in range(lookups)]
+            start = time.perf_counter()
+            for vid in probes:
+                store.contains(BENCH_CHANNEL, vid)
+            lookup_seconds = (time.perf_counter() - start) / lookups
+
+            urls = [f"https://www.youtube.com/shorts/{vid}" for vid in probes[:500] + video_ids(size + 500)[size:]]
+            start = time.perf_counter()
+            store.filter_new(BENCH_CHANNEL, urls, key=scrapper.extract_video_id)
+            filter_seconds = time.perf_counter() - start
+
+            new_ids = [f"w{index:010d}" for index in range(writes)]
+            start = time.perf_counter()
+            for vid in new_ids:
+                store.add(BENCH_CHANNEL, [vid])
+            write_seconds = (time.perf_counter() - start) / writes
+
+            start = time.perf_counter()
+            store.close()
+            close_seconds = time.perf_counter() - start
+
+            results.append({
+                "size": size,
+                "backend": backend,
+                "legacy_lookup_ms": legacy_lookup * 1000,
+                "load_ms": load_seconds * 1000,
+                "lookup_us": lookup_seconds * 1e6,
+                "filter_1000_ms": filter_seconds * 1000,
+                "write_us": write_seconds * 1e6,
+                "close_ms": close_seconds * 1000
+            })
+    return results
+
+def bench_download(scrapper, stand_in, workdir, threads):
+    """Playlist enumeration plus downloads through the streaming pipeline"""
+    import content_index
+    download_path = os.path.join(workdir, "downloads")
+    os.makedirs(download_path, exist_ok=True)
+    scrapper.CHANNEL_HISTORY_FILE = os.path.join(workdir, "bench_history.json")
+    scrapper.WATERMARK_FILE = os.path.join(workdir, "bench_watermarks.json")
+    scrapper.METADATA_CACHE_DIR = os.path.join(workdir, "metadata_cache")
+    scrapper._history_store = None
+    content_index.CONTENT_INDEX_FILE = os.path.join(workdir, "content_index.db")
+    # Fixture media carries no height/codec metadata and there is no ffmpeg here
+    scrapper.SEPARATE_MERGE_STAGE = False
+    scrapper.MERGED_FORMAT = "best"
+
+    latencies = []
+    latency_lock = threading.Lock()
+    download_video = scrapper.download_video
+
+    def timed_download(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return download_video(*args, **kwargs)
+        finally:
+            with latency_lock:
+                latencies.append(time.perf_counter() - start)
+
+    scrapper.download_video = timed_download
+    bytes_before = scrapper.downloaded_bytes
+    scrapper.start_run_manifest(download_path)
+    start = time.perf_counter()
+    try:
+        found, queued = scrapper.stream_downloads(
+            f"{stand_in.base_url}/feed.xml", BENCH_CHANNEL, download_path, threads, 2
+        )
+    finally:
+        scrapper.download_video = download_video
+    elapsed = time.perf_counter() - start
+    scrapper.get_history_store().close()
+    scrapper.close_ydl_pool()
+    content_index.close_content_index()
+    stored = len([name for name in os.listdir(download_path) if name.endswith(".mp4")])
+
+    total_bytes = scrapper.downloaded_bytes - bytes_before
+    return {
+        "videos": queued,
+        "found": found,
+        "duplicates": queued - stored,
+        "seconds": elapsed,
+        "videos_per_sec": queued / elapsed if elapsed else 0.0,
+        "bytes_per_sec": total_bytes / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0
+    }
+
+def bench_upload(uploader, stand_in, workdir, uploads):
+    """videos().insert against the fake API"""
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.http import build_http
+
+    # build_http keeps 308 (resumable "incomplete") from being treated as a redirect
+    youtube = build_from_document(stand_in.discovery(), http=build_http())
+    media_file = os.path.join(workdir, "upload_fixture.mp4")
+    with open(media_file, "wb") as f:
+        f.write(stand_in.media)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(uploads):
+        upload_start = time.perf_counter()
+        uploader.upload_video(youtube, media_file, {}, "Benchmark", "Benchmark upload", ["bench"], "private", "24")
+        latencies.append(time.perf_counter() - upload_start)
+    elapsed = time.perf_counter() - start
+    return {
+        "uploads": uploads,
+        "seconds": elapsed,
+        "videos_per_sec": uploads / elapsed if elapsed else 0.0,
+        "bytes_per_sec": uploads * len(stand_in.media) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+
+def bench_startup(uploader, stand_in, workdir, channels):
+    """Per-run client setup: sequential refresh + build() vs the cached factory"""
+    from google.auth.transport.requests import Request
+    from google.oauth2 import credentials as oauth2_credentials
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    token_files = []
+    for index in range(channels):
+        token_file = os.path.join(workdir, "auth", f"bench{index}_token.json")
+        os.makedirs(os.path.dirname(token_file), exist_ok=True)
+        with open(token_file, "w") as f:
+            json.dump({"refresh_token": "bench", "client_id": "bench", "client_secret": "bench"}, f)
+        token_files.append(token_file)
+    configs = [{"channel_id": f"bench{index}", "client_secrets_file": "", "token_file": token_file}
+               for index, token_file in enumerate(token_files)]
+    # Stored token files always refresh against Google's endpoint; point it here
+    token_endpoint = oauth2_credentials._GOOGLE_OAUTH2_TOKEN_ENDPOINT
+    oauth2_credentials._GOOGLE_OAUTH2_TOKEN_ENDPOINT = f"{stand_in.base_url}/token"
+
+    start = time.perf_counter()
+    for token_file in token_files:
+        credentials = Credentials.from_authorized_user_file(token_file, uploader.SCOPES)
+        credentials.refresh(Request())
+        build("youtube", "v3", credentials=credentials, static_discovery=True)
+    legacy = time.perf_counter() - start
+
+    uploader.DISCOVERY_CACHE_FILE = os.path.join(workdir, "youtube_v3_discovery.json")
+    start = time.perf_counter()
+    uploader.refresh_all_credentials(configs)
+    for config in configs:
+        uploader.authenticate_channel(config["client_secrets_file"], config["token_file"])
+    cached = time.perf_counter() - start
+    oauth2_credentials._GOOGLE_OAUTH2_TOKEN_ENDPOINT = token_endpoint
+    return {
+        "channels": channels,
+        "legacy_ms": legacy * 1000,
+        "cached_ms": cached * 1000,
+        "speedup": legacy / cached if cached else 0.0
+    }
+
+
+def bench_quota(uploader, stand_in, workdir, channels, projects, per_channel, inserts_per_project):
+    """Uploads completed vs rejected when pending work exceeds the daily quota"""
+    import content_index
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.http import build_http
+
+    secrets = {}
+    for project in range(projects):
+        secrets_file = os.path.join(workdir, "auth", f"project{project}_client_secret.json")
+        os.makedirs(os.path.dirname(secrets_file), exist_ok=True)
+        with open(secrets_file, "w") as f:
+            json.dump({"installed": {"client_id": f"bench-project-{project}"}}, f)
+        secrets[secrets_file] = f"bench-project-{project}"
+
+    uploader.authenticate_channel = lambda secrets_file, token_file: build_from_document(
+        stand_in.discovery(), http=build_http(), developerKey=secrets[secrets_file]
+    )
+    uploader.load_credentials = lambda secrets_file, token_file: Credentials("bench")
+    stand_in.quota = inserts_per_project * stand_in.quota_cost
+
+    results = []
+    for mode in ("unplanned", "planned"):
+        root = os.path.join(workdir, f"quota_{mode}")
+        uploader.TRACKING_DIR = os.path.join(root, "tracking")
+        uploader.FOLDER_INDEX_DIR = os.path.join(uploader.TRACKING_DIR, "folder_index")
+        uploader.UPLOAD_SESSIONS_FILE = os.path.join(uploader.TRACKING_DIR, "upload_sessions.json")
+        uploader._folder_indexes.clear()
+        content_index.close_content_index()
+        content_index.CONTENT_INDEX_FILE = os.path.join(root, "content_index.db")
+        configs = []
+        for index in range(channels):
+            folder = os.path.join(root, f"channel{index}")
+            os.makedirs(folder, exist_ok=True)
+            for clip in range(per_channel):
+                with open(os.path.join(folder, f"clip_{index:05d}{clip:06d}.mp4"), "wb") as f:
+                    f.write(f"clip{index:05d}{clip:06d}".encode() + stand_in.media[:65536])
+            configs.append({
+                "channel_id": f"bench{index}", "client_secrets_file": list(secrets)[index % projects],
+                "token_file": "", "source_folder": folder, "default_title": "Benchmark",
+                "default_description": "Benchmark upload", "tags": [], "privacy_status": "private",
+                "category_id": "24", "upload_interval": 0, "max_uploads_per_run": per_channel,
+                "daily_quota": stand_in.quota, "upload_quota_cost": stand_in.quota_cost,
+                "prepare_uploads": False
+            })
+        stand_in.quota_used.clear()
+        stand_in.quota_rejections = 0
+        start = time.perf_counter()
+        if mode == "planned":
+            ledger = uploader.QuotaLedger(os.path.join(uploader.TRACKING_DIR, "quota_ledger.json"))
+            plan = uploader.plan_uploads(configs, ledger)
+            uploaded = sum(uploader.run_channel(config, plan[config["channel_id"]], ledger) for config in configs)
+        else:
+            uploaded = sum(uploader.run_channel(config) for config in configs)
+        uploader.close_upload_trackers()
+        content_index.close_content_index()
+        results.append({
+            "mode": mode,
+            "pending": channels * per_channel,
+            "uploaded": uploaded,
+            "rejected": stand_in.quota_rejections,
+            "deferred": channels * per_channel - uploaded,
+            "seconds": time.perf_counter() - start
+        })
+    stand_in.quota = None
+    return results
+
+
+def bench_prepare(workdir, clips, seconds, bitrate):
+    """Pre-upload preparation: serial vs the process pool, then the warm cache"""
+    import content_index
+    import prepare
+
+    if not (shutil.which(prepare.FFMPEG_BINARY) and shutil.which(prepare.FFPROBE_BINARY)):
+        print("\nSkipping preparation benchmark: ffmpeg/ffprobe not found")
+        return None
+    content_index.close_content_index()
+    content_index.CONTENT_INDEX_FILE = os.path.join(workdir, "prepare_index.db")
+    sources = []
+    for index in range(clips):
+        # Oversized .mov inputs, as a phone or editor export would produce
+        path = os.path.join(workdir, "prepare_src", f"clip{index}.mov")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        subprocess.run([
+            prepare.FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=1080x1920:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency={440 + index}:duration={seconds}",
+            "-c:v", "libx264", "-b:v", str(bitrate), "-c:a", "aac", path
+        ], check=True)
+        sources.append(path)
+    hashes = [content_index.get_content_index().hash_file(path) for path in sources]
+
+    serial_dir = os.path.join(workdir, "prepare_serial")
+    os.makedirs(serial_dir, exist_ok=True)
+    start = time.perf_counter()
+    for path, content_hash in zip(sources, hashes):
+        prepare.prepare_file(path, os.path.join(serial_dir, f"{content_hash}.mp4"))
+    serial = time.perf_counter() - start
+
+    preparer = prepare.Preparer(os.path.join(workdir, "prepared"))
+    start = time.perf_counter()
+    preparer.prefetch(sources)
+    outputs = [preparer.prepare(path, content_hash) for path, content_hash in zip(sources, hashes)]
+    pooled = time.perf_counter() - start
+    start = time.perf_counter()
+    for path, content_hash in zip(sources, hashes):
+        preparer.prepare(path, content_hash)
+    warm = time.perf_counter() - start
+    preparer.close()
+    content_index.close_content_index()
+
+    original = sum(os.path.getsize(path) for path in sources)
+    prepared = sum(os.path.getsize(path) for path in outputs)
+    return {
+        "clips": clips,
+        "workers": preparer.workers,
+        "original_mb": original / 1e6,
+        "prepared_mb": prepared / 1e6,
+        "saved_pct": 100 * (original - prepared) / original if original else 0.0,
+        "serial_s": serial,
+        "pool_s": pooled,
+        "cached_ms": warm * 1000
+    }
+
+
+def print_table(title, rows):
+    print(f"\n\033[1m{title}\033[0m")
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    print("  ".join(f"{h:>16}" for h in headers))
+    for row in rows:
+        print("  ".join(f"{v:>16.3f}" if isinstance(v, float) else f"{v!s:>16}" for v in row.values()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline downloader/uploader benchmarks")
+    parser.add_argument("--only", choices=("history", "download", "upload", "startup", "quota", "prepare"), action="append")
+    parser.add_argument("--history-sizes", default="1000,10000,100000")
+    parser.add_argument("--videos", type=int, default=100, help="synthetic playlist size")
+    parser.add_argument("--media-size", type=int, default=1_000_000, help="fixture size in bytes")
+    parser.add_argument("--latency", type=float, default=0.0, help="per-request latency in seconds")
+    parser.add_argument("--bandwidth", type=int, default=0, help="bytes/s per response, 0 = unlimited")
+    parser.add_argument("--duplicate-every", type=int, default=0, help="every Nth video repeats the previous one's content")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=4, help="channels for the startup and quota benchmarks")
+    parser.add_argument("--projects", type=int, default=2, help="OAuth projects shared by the channels")
+    parser.add_argument("--quota-inserts", type=int, default=3, help="inserts each project can afford per day")
+    parser.add_argument("--prepare-clips", type=int, default=8, help="clips generated for the preparation benchmark")
+    parser.add_argument("--prepare-seconds", type=int, default=10, help="length of each generated clip")
+    parser.add_argument("--prepare-bitrate", type=int, default=25_000_000, help="video bitrate of the generated clips")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+    selected = set(args.only or ("history", "download", "upload", "startup", "quota", "prepare"))
+
+    original_cwd = os.getcwd()
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, repo_dir)
+    workdir = tempfile.mkdtemp(prefix="yt_bench_")
+    # The scripts create their log files and folders relative to the cwd
+    os.chdir(workdir)
+    results = {}
+    stand_in = StandIn(args.videos, args.media_size, args.latency, args.bandwidth, duplicate_every=args.duplicate_every).start()
+    try:
+        if selected & {"history", "download"}:
+            import ScrapperDS as scrapper
+            scrapper.METRICS_PORT = None
+        if "history" in selected:
+            sizes = [int(size) for size in args.history_sizes.split(",") if size]
+            results["history"] = bench_history(scrapper, sizes, workdir)
+            print_table("History I/O", results["history"])
+        if "download" in selected:
+            results["download"] = bench_download(scrapper, stand_in, workdir, args.threads)
+            print_table("Download", [results["download"]])
+        if "upload" in selected:
+            import uploaderCP as uploader
+            results["upload"] = bench_upload(uploader, stand_in, workdir, args.uploads)
+            print_table("Upload", [results["upload"]])
+        if "startup" in selected:
+            import uploaderCP as uploader
+            results["startup"] = bench_startup(uploader, stand_in, workdir, args.channels)
+            print_table("Uploader startup", [results["startup"]])
+        if "quota" in selected:
+            import uploaderCP as uploader
+            results["quota"] = bench_quota(uploader, stand_in, workdir, args.channels, args.projects, 3, args.quota_inserts)
+            print_table("Quota planning", results["quota"])
+        if "prepare" in selected:
+            results["prepare"] = bench_prepare(workdir, args.prepare_clips, args.prepare_seconds, args.prepare_bitrate)
+            if results["prepare"]:
+                print_table("Pre-upload preparation", [results["prepare"]])
+    finally:
+        stand_in.stop()
+        os.chdir(original_cwd)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from paths import HISTORY_DIR
+
+# Shared by the downloader and the uploader, so it lives with the download history
+CONTENT_INDEX_FILE = os.path.join(HISTORY_DIR, "content_index.db")
+SAMPLE_SIZE = 64 * 1024   # Bytes read per sample
+SAMPLE_COUNT = 16         # Samples spread evenly over the file, first and last included
+
+
+def sampled_hash(path, sample_size=SAMPLE_SIZE, samples=SAMPLE_COUNT):
+    """Content fingerprint from the file size plus evenly spaced samples
+
+    Reads at most samples * sample_size bytes, so large clips hash as fast as
+    small ones; files smaller than that are hashed in full.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        if size <= sample_size * samples:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        else:
+            step = (size - sample_size) // (samples - 1)
+            for index in range(samples):
+                f.seek(index * step)
+                digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """Shared SQLite index of file content hashes and where each was uploaded
+
+    Hashes are cached per (path, size, mtime), so a file is read once. Both the
+    downloader and the uploader open the same database; WAL mode lets them do
+    so concurrently.
+    """
+
+    def __init__(self, db_file=None):
+        self.db_file = db_file or CONTENT_INDEX_FILE
+        if os.path.dirname(self.db_file):
+            os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT NOT NULL,"
+            " video_id TEXT, channel_id TEXT, added_at REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS files_hash ON files (hash)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " hash TEXT NOT NULL, channel_id TEXT NOT NULL, video_id TEXT, uploaded_at REAL,"
+            " PRIMARY KEY (hash, channel_id))"
+        )
+
+    def hash_file(self, path):
+        """Content hash of a file, computed only if it changed since last seen"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime, hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+        content_hash = sampled_hash(path)
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO files (path, size, mtime, hash, added_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, hash = excluded.hash",
+                (path, stat.st_size, stat.st_mtime, content_hash, time.time())
+            )
+        return content_hash
+
+    def add_file(self, path, video_id=None, channel_id=None, same_folder=False):
+        """Index a file; returns (hash, path of an existing copy or None)
+
+        With same_folder only copies in the file's own folder count, since
+        every folder feeds its own upload channel.
+        """
+        path = os.path.abspath(path)
+        content_hash = self.hash_file(path)
+        with self.lock:
+            self.db.execute(
+                "UPDATE files SET video_id = COALESCE(?, video_id), channel_id = COALESCE(?, channel_id) WHERE path = ?",
+                (video_id, channel_id, path)
+            )
+            others = [row[0] for row in self.db.execute(
+                "SELECT path FROM files WHERE hash = ? AND path != ? ORDER BY added_at", (content_hash, path)
+            )]
+        for other in others:
+            if same_folder and os.path.dirname(other) != os.path.dirname(path):
+                continue
+            if os.path.exists(other):
+                return content_hash, other
+            self.forget(other)
+        return content_hash, None
+
+    def forget(self, path):
+        with self.lock:
+            self.db.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+
+    def uploaded_to(self, content_hash, channel_id):
+        """YouTube ID this content was already uploaded as on the channel, if any"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT video_id FROM uploads WHERE hash = ? AND channel_id = ?", (content_hash, channel_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def was_uploaded(self, path, channel_id):
+        """True if the content at path was uploaded to channel_id
+
+        Each folder keeps its own copy for its own channel, so an upload of the
+        same clip elsewhere does not make this copy disposable.
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT 1 FROM files JOIN uploads ON uploads.hash = files.hash"
+                " WHERE files.path = ? AND uploads.channel_id = ? LIMIT 1",
+                (os.path.abspath(path), channel_id)
+            ).fetchone()
+        return row is not None
+
+    def mark_uploaded(self, content_hash, channel_id, video_id):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO uploads (hash, channel_id, video_id, uploaded_at) VALUES (?, ?, ?, ?)",
+                (content_hash, channel_id, video_id, time.time())
+            )
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+_content_index = None
+_content_index_lock = threading.Lock()
+
+def get_content_index():
+    """Process-wide ContentIndex on CONTENT_INDEX_FILE"""
+    global _content_index
+    with _content_index_lock:
+        if _content_index is None:
+            _content_index = ContentIndex()
+            logging.info(f"Content index: {_content_index.db_file}")
+        return _content_index
+
+def close_content_index():
+    global _content_index
+    with _content_index_lock:
+        if _content_index is not None:
+            _content_index.close()
+            _content_index = None
@@ -0,0 +1,212 @@
+"""Non-interactive runner for download and upload jobs
+
+A job file (JSON, or YAML when PyYAML is installed) lists what to download and
+where to upload, so runs can be scheduled from cron or Task Scheduler with no
+terminal attached:
+
+  {
+    "download": {
+      "threads": 10, "retries": 3, "incremental": true,
+      "channels": [
+        {"url": "https://www.youtube.com/@SomeChannel", "path": "C:\\\\Media\\\\Some",
+         "start": 0, "limit": 20, "full_scan": false}
+      ]
+    },
+    "upload": {
+      "channels": ["clipper645", {"channel_id": "nightowl", "max_uploads_per_run": 5}]
+    }
+  }
+
+Upload entries name a channel from uploaderCP.CHANNELS_CONFIG, optionally with
+overrides; entries with an unknown channel_id must be a complete config.
+
+  python jobrunner.py plan job.json                  # what a run would do, no network
+  python jobrunner.py run job.json                   # download, then upload
+  python jobrunner.py history CHANNEL [VIDEO_ID ...]
+
+Google OAuth tokens must already exist: a headless run stops instead of
+opening a browser. Run uploaderCP.py once interactively to create them.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+from colorama import Fore, Style
+
+import ScrapperDS as downloader
+import uploaderCP as uploader
+
+
+def load_job(job_file):
+    with open(job_file, "r") as f:
+        if job_file.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit(f"{job_file} is YAML but PyYAML is not installed; use JSON or pip install pyyaml")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+def download_jobs(job):
+    """Download channel entries with the job-level defaults filled in"""
+    section = job.get("download") or {}
+    jobs = []
+    for entry in section.get("channels", []):
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        start = entry.get("start", 0)
+        limit = entry.get("limit")
+        jobs.append({
+            "url": entry["url"],
+            "path": entry["path"],
+            "threads": entry.get("threads", section.get("threads", 10)),
+            "retries": entry.get("retries", section.get("retries", 3)),
+            "start": start,
+            "end": start + limit - 1 if limit else None,
+            "incremental": entry.get("incremental", section.get("incremental", False)),
+            "full_scan": entry.get("full_scan", False),
+        })
+    return jobs
+
+def upload_configs(job):
+    """Upload channel configs, resolved against uploaderCP.CHANNELS_CONFIG"""
+    known = {config["channel_id"]: config for config in uploader.CHANNELS_CONFIG}
+    configs = []
+    for entry in (job.get("upload") or {}).get("channels", []):
+        if isinstance(entry, str):
+            entry = {"channel_id": entry}
+        base = known.get(entry["channel_id"])
+        if base is None and "source_folder" not in entry:
+            raise SystemExit(f"Upload channel {entry['channel_id']} is not in CHANNELS_CONFIG and has no full config")
+        configs.append({**(base or {}), **entry})
+    return configs
+
+
+def plan(job):
+    """Print what a run would do, from local state only"""
+    store = downloader.get_history_store()
+    for item in download_jobs(job):
+        channel_id = downloader.get_channel_id(item["url"])
+        mark = downloader.load_watermark(channel_id)
+        if not item["incremental"]:
+            scan = "full listing"
+        elif item["full_scan"] or downloader.needs_full_scan(mark) or not mark.get("newest_id"):
+            scan = "full scan (watermark missing or stale)" if not item["full_scan"] else "full scan (forced)"
+        else:
+            scan = f"incremental since {mark['newest_id']}"
+            if mark.get('resume_id'):
+                scan += f", then resuming below {mark['resume_id']}"
+        wanted = f"{item['start']}-{item['end']}" if item["end"] is not None else f"{item['start']}-end"
+        storage = downloader.get_storage_manager(
+            item["path"], downloader.DOWNLOAD_BUDGET_BYTES, downloader.was_uploaded
+        )
+        budget = f"{storage.budget_bytes / 1e9:.1f} GB" if storage.budget_bytes else "unbounded"
+        print(f"\n\033[1mDownload {channel_id}\033[0m -> {os.path.abspath(item['path'])}")
+        print(f"  {downloader.validate_url(item['url'])}")
+        print(f"  {len(store.get_channel(channel_id))} videos in history, {scan}")
+        print(f"  New Shorts {wanted}, {item['threads']} threads, {item['retries']} retries")
+        print(f"  Storage: {storage.usage(refresh=True) / 1e9:.2f} GB used of {budget}")
+
+    configs = upload_configs(job)
+    if configs:
+        ledger = uploader.QuotaLedger()
+        allowed = uploader.plan_uploads(configs, ledger)
+        for config in configs:
+            channel = config["channel_id"]
+            tracking_file = os.path.join(uploader.TRACKING_DIR, f"uploaded_videos_{channel}.json")
+            if os.path.isdir(config["source_folder"]):
+                pending = f"{len(uploader.get_pending_video_files(config['source_folder'], tracking_file))} pending"
+            else:
+                pending = Fore.RED + "source folder missing" + Style.RESET_ALL
+            project = uploader.quota_project(config["client_secrets_file"])
+            quota = config.get("daily_quota", uploader.DAILY_QUOTA)
+            token = "token present" if os.path.exists(config["token_file"]) else Fore.RED + "no token" + Style.RESET_ALL
+            print(f"\n\033[1mUpload {channel}\033[0m <- {config['source_folder']}")
+            print(f"  {pending}, {allowed.get(channel, 0)} this run, {token}")
+            print(f"  Quota: {quota - ledger.used(project)} of {quota} units left today")
+        print(f"\nQuota resets in {uploader.seconds_until_quota_reset() / 3600:.1f}h")
+    store.close()
+
+def run(job):
+    """Download every channel, then upload; returns the process exit code"""
+    uploader.ALLOW_INTERACTIVE_AUTH = False
+    started = time.monotonic()
+    failures = 0
+    items = download_jobs(job)
+    if items:
+        downloader.rate_limiter = downloader.TokenBucket(downloader.RATE_LIMIT_PER_SEC, downloader.RATE_LIMIT_BURST)
+        try:
+            for item in items:
+                try:
+                    summary = downloader.run_download_job(
+                        item["url"], item["path"], item["threads"], item["retries"],
+                        start_index=item["start"], end_index=item["end"],
+                        incremental=item["incremental"], full_scan=item["full_scan"]
+                    )
+                except Exception as e:
+                    logging.error(f"Download job for {item['url']} failed: {str(e)}", exc_info=True)
+                    print(Fore.RED + f"Download of {item['url']} failed: {e}" + Style.RESET_ALL)
+                    failures += 1
+                    continue
+                failures += summary["failed"] + summary["corrupt"]
+                print(f"{summary['channel_id']}: {summary['queued']} queued, {summary['verified']} verified, "
+                      f"{summary['failed']} failed, {summary['bytes'] / 1e6:.1f} MB")
+        finally:
+            downloader.get_history_store().close()
+            downloader.close_ydl_pool()
+
+    configs = []
+    for config in upload_configs(job):
+        if os.path.exists(config["token_file"]):
+            configs.append(config)
+            continue
+        # Authorising needs a browser; run uploaderCP.py interactively once first
+        logging.error(f"Skipping uploads for {config['channel_id']}: no token at {config['token_file']}")
+        print(Fore.RED + f"No OAuth token for {config['channel_id']}; skipping its uploads" + Style.RESET_ALL)
+        failures += 1
+    if configs:
+        results = uploader.run_uploads(configs)
+        print(f"Uploaded {sum(results.values())} videos "
+              f"({', '.join(f'{channel}: {count}' for channel, count in results.items())})")
+    else:
+        downloader.close_content_index()
+        downloader.close_work_queue()
+
+    logging.info(f"Job finished in {time.monotonic() - started:.0f}s with {failures} failures")
+    return 1 if failures else 0
+
+def history(channel, video_ids):
+    """Print a channel's history size, or whether each video ID is in it"""
+    store = downloader.get_history_store()
+    channel_id = downloader.get_channel_id(channel) if "/" in channel or "@" in channel else channel
+    if video_ids:
+        for video_id in video_ids:
+            print(f"{video_id}: {'downloaded' if store.contains(channel_id, video_id) else 'new'}")
+    else:
+        print(f"{channel_id}: {len(store.get_channel(channel_id))} videos in history")
+    store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run download and upload jobs without prompts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("plan", help="show what a run would do, without network access").add_argument("job_file")
+    commands.add_parser("run", help="download, then upload").add_argument("job_file")
+    history_parser = commands.add_parser("history", help="query the download history")
+    history_parser.add_argument("channel", help="channel ID or URL")
+    history_parser.add_argument("video_ids", nargs="*")
+    args = parser.parse_args(argv)
+
+    if args.command == "history":
+        history(args.channel, args.video_ids)
+        return 0
+    job = load_job(args.job_file)
+    if args.command == "plan":
+        plan(job)
+        return 0
+    return run(job)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# Journal tuning
+FSYNC_EVERY = 50          # fsync after this many buffered lines
+FSYNC_INTERVAL = 1.0      # ...or after this many seconds, whichever comes first
+COMPACT_AFTER = 5000      # fold the journal into the snapshot after this many lines
+
+
+@contextmanager
+def file_lock(lock_path):
+    """Exclusive lock shared between threads and processes via a sidecar file"""
+    with open(lock_path, "a+") as f:
+        if os.name == "nt":
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class Journal:
+    """Keyed ID sets stored as a JSON snapshot plus an append-only journal
+
+    The snapshot keeps the plain {key: [ids]} layout so existing files load
+    unchanged. Each append writes one line per ID under a process lock and is
+    fsynced in batches; compaction folds the journal back into the snapshot.
+    With list_key set the snapshot is a plain JSON list holding that one key.
+    """
+
+    def __init__(self, snapshot_file, journal_file=None, fsync_every=FSYNC_EVERY,
+                 fsync_interval=FSYNC_INTERVAL, compact_after=COMPACT_AFTER, list_key=None):
+        self.snapshot_file = snapshot_file
+        self.list_key = list_key
+        self.journal_file = journal_file or f"{snapshot_file}.journal"
+        self.lock_file = f"{snapshot_file}.lock"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.journal_lines = 0
+        self.handle = None
+        self.stop_event = threading.Event()
+        self.compact_event = threading.Event()
+        self.worker = None
+
+    def _read(self):
+        """Merge snapshot and journal from disk (caller holds the file lock)"""
+        data = {}
+        if Path(self.snapshot_file).exists():
+            with open(self.snapshot_file, "r") as f:
+                snapshot = json.load(f)
+            if self.list_key is not None:
+                data[self.list_key] = set(snapshot or [])
+            else:
+                for key, ids in (snapshot or {}).items():
+                    data[key] = set(ids)
+        lines = 0
+        if Path(self.journal_file).exists():
+            with open(self.journal_file, "r") as f:
+                for line in f:
+                    try:
+                        key, value = json.loads(line)
+                    except ValueError:
+                        # Torn last line from a crash mid-write
+                        logging.warning(f"Skipping corrupt journal line in {self.journal_file}")
+                        continue
+                    data.setdefault(key, set()).add(value)
+                    lines += 1
+        return data, lines
+
+    def load(self):
+        """Return {key: set(ids)} and start the background flusher"""
+        with file_lock(self.lock_file):
+            data, self.journal_lines = self._read()
+        self.handle = open(self.journal_file, "a")
+        self.worker = threading.Thread(target=self._background, daemon=True)
+        self.worker.start()
+        if self.journal_lines >= self.compact_after:
+            self.compact_event.set()
+        return data
+
+    def append(self, key, values):
+        """Append one journal line per value; cost does not depend on history size"""
+        lines = "".join(json.dumps([key, value]) + "\n" for value in values)
+        if not lines:
+            return
+        with self.lock:
+            with file_lock(self.lock_file):
+                self.handle.write(lines)
+                self.handle.flush()
+            self.pending += len(values)
+            self.journal_lines += len(values)
+            if self.pending >= self.fsync_every:
+                self._fsync()
+        if self.journal_lines >= self.compact_after:
+            self.compact_event.set()
+
+    def _fsync(self):
+        """Caller holds self.lock"""
+        if self.pending:
+            os.fsync(self.handle.fileno())
+            self.pending = 0
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate it"""
+        with self.lock:
+            self._fsync()
+            with file_lock(self.lock_file):
+                data, _ = self._read()
+                tmp_file = f"{self.snapshot_file}.tmp"
+                with open(tmp_file, "w") as f:
+                    if self.list_key is not None:
+                        json.dump(sorted(data.get(self.list_key, ())), f)
+                    else:
+                        json.dump({key: sorted(ids) for key, ids in data.items()}, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.snapshot_file)
+                self.handle.truncate(0)
+                self.journal_lines = 0
+        logging.info(f"Compacted journal into {self.snapshot_file}")
+        return data
+
+    def _background(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            with self.lock:
+                self._fsync()
+            if self.compact_event.is_set():
+                self.compact_event.clear()
+                try:
+                    self.compact()
+                except Exception as e:
+                    logging.error(f"Journal compaction failed: {str(e)}")
+
+    def close(self, compact=True):
+        """Flush outstanding lines, optionally compact, and stop the flusher"""
+        if self.handle is None:
+            return
+        self.stop_event.set()
+        if self.worker is not None:
+            self.worker.join()
+        if compact and self.journal_lines:
+            self.compact()
+        with self.lock:
+            self._fsync()
+            self.handle.close()
+            self.handle = None
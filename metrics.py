@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (1e4, 5e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7, 1e8)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Bucket upper bound containing the q-th observation"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Thread-safe counters, gauges and histograms with Prometheus/JSON export"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.kinds = {}
+        self.help = {}
+        self.buckets = {}
+        self.values = {}
+
+    def declare(self, name, kind, help_text, buckets=LATENCY_BUCKETS):
+        self.kinds[name] = kind
+        self.help[name] = help_text
+        if kind == 'histogram':
+            self.buckets[name] = buckets
+        self.values.setdefault(name, {})
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[name][_label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(self.buckets[name])
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, series in self.values.items():
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full_name} {self.help[name]}")
+                lines.append(f"# TYPE {full_name} {self.kinds[name]}")
+                for key, value in series.items():
+                    if isinstance(value, Histogram):
+                        running = 0
+                        for bound, count in zip(value.buckets, value.counts):
+                            running += count
+                            lines.append(f"{full_name}_bucket{_format_labels(key, [('le', bound)])} {running}")
+                        lines.append(f"{full_name}_bucket{_format_labels(key, [('le', '+Inf')])} {value.count}")
+                        lines.append(f"{full_name}_sum{_format_labels(key)} {value.sum}")
+                        lines.append(f"{full_name}_count{_format_labels(key)} {value.count}")
+                    else:
+                        lines.append(f"{full_name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        data = {'timestamp': time.time()}
+        with self.lock:
+            for name, series in self.values.items():
+                entries = []
+                for key, value in series.items():
+                    entry = {'labels': dict(key)}
+                    if isinstance(value, Histogram):
+                        entry.update(
+                            count=value.count, sum=value.sum,
+                            avg=value.sum / value.count if value.count else 0.0,
+                            p50=value.quantile(0.5), p99=value.quantile(0.99)
+                        )
+                    else:
+                        entry['value'] = value
+                    entries.append(entry)
+                data[name] = entries
+        return data
+
+
+def serve_metrics(metrics, port, host="127.0.0.1"):
+    """Expose /metrics in Prometheus text format on a background thread
+
+    Returns None, after logging why, if the port cannot be bound (e.g. another
+    downloader on this host already serves it); metrics are still collected.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logging.warning(f"Metrics endpoint disabled, cannot bind {host}:{port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Metrics endpoint on http://{host}:{port}/metrics")
+    return server
+
+def start_json_dump(metrics, path, interval):
+    """Rewrite a JSON snapshot of the metrics every `interval` seconds"""
+    stop_event = threading.Event()
+
+    def dump():
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(metrics.to_dict(), f, indent=2)
+        # Readers never see a half-written file
+        os.replace(tmp_path, path)
+
+    def run():
+        while not stop_event.wait(interval):
+            try:
+                dump()
+            except Exception as e:
+                logging.warning(f"Metrics dump failed: {str(e)}")
+        dump()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    def stop():
+        stop_event.set()
+        thread.join()
+    return stop
@@ -0,0 +1,10 @@
+"""State directories shared by the downloader, the uploader and their helpers
+
+Both can be overridden per node through the environment.
+"""
+import os
+
+# Download history, watermarks and the shared content index
+HISTORY_DIR = os.environ.get("YT_HISTORY_DIR", r"C:\Users\meetd\Desktop\YT root\Core")
+# Upload tracking files, sessions, quota ledger and the prepared-upload cache
+TRACKING_DIR = os.environ.get("YT_TRACKING_DIR", r"C:\Users\meetd\Desktop\YT root\Core\source code")
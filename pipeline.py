@@ -0,0 +1,210 @@
+"""Download-to-upload daemon
+
+Polls each upload channel's source channels for new Shorts and downloads them
+into the channel's source_folder. Every finished download is pushed through a
+durable SQLite queue straight to that channel's upload worker, so nothing waits
+for the next uploader run or folder scan.
+
+pipeline_sources.json maps an upload channel_id from uploaderCP.CHANNELS_CONFIG
+to the channels it re-uploads from:
+
+  {"clipper645": ["https://www.youtube.com/@SomeChannel/shorts"]}
+"""
+import os
+import json
+import time
+import logging
+import threading
+from colorama import Fore
+
+import ScrapperDS as downloader
+import uploaderCP as uploader
+from upload_queue import UploadQueue, FAILED
+from content_index import close_content_index
+from work_queue import close_work_queue
+from prepare import get_preparer, close_preparer
+
+PIPELINE_SOURCES_FILE = os.path.join(downloader.HISTORY_DIR, "pipeline_sources.json")
+PIPELINE_QUEUE_FILE = os.path.join(uploader.TRACKING_DIR, "upload_queue.db")
+POLL_INTERVAL = 600      # Seconds between two syncs of the source channels
+MAX_BACKLOG = 10         # Queued uploads per channel before its sources stop downloading
+DOWNLOAD_THREADS = 4
+MAX_RETRIES = 3
+RETRY_DELAY = 120        # Seconds before a failed upload is retried
+AUTH_RETRY_DELAY = 1800  # Seconds before a channel whose token is missing or broken tries again
+
+
+def load_sources(sources_file=PIPELINE_SOURCES_FILE):
+    with open(sources_file, "r") as f:
+        return json.load(f)
+
+def folder_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class Pipeline:
+    def __init__(self, channels_config, sources, queue_file=PIPELINE_QUEUE_FILE):
+        self.configs = [config for config in channels_config if sources.get(config["channel_id"])]
+        self.sources = sources
+        self.routes = {folder_key(config["source_folder"]): config for config in self.configs}
+        os.makedirs(os.path.dirname(queue_file), exist_ok=True)
+        self.queue = UploadQueue(queue_file)
+        self.ledger = uploader.QuotaLedger()
+        self.stop_event = threading.Event()
+        self.download_thread = None
+        self.threads = []
+
+    def on_download(self, source_channel_id, video_id, path):
+        """downloader listener: route a finished file to its upload channel"""
+        if not path:
+            return
+        config = self.routes.get(folder_key(os.path.dirname(path)))
+        if config and self.queue.put(config["channel_id"], video_id, path):
+            logging.info(f"Queued {os.path.basename(path)} for upload to {config['channel_id']}")
+            if config.get("prepare_uploads", uploader.PREPARE_UPLOADS):
+                get_preparer().prefetch([path])
+
+    def seed(self):
+        """Queue files already sitting in the source folders from earlier runs"""
+        for config in self.configs:
+            tracking_file = os.path.join(uploader.TRACKING_DIR, f"uploaded_videos_{config['channel_id']}.json")
+            os.makedirs(config["source_folder"], exist_ok=True)
+            # Oldest first, so the queue order matches download order
+            for path, video_id in reversed(uploader.get_pending_video_files(config["source_folder"], tracking_file)):
+                self.queue.put(config["channel_id"], video_id, path)
+
+    def download_loop(self):
+        while not self.stop_event.is_set():
+            for config in self.configs:
+                if self.stop_event.is_set():
+                    break
+                channel = config["channel_id"]
+                backlog = self.queue.depth(channel)
+                if backlog >= MAX_BACKLOG:
+                    # Uploads (usually quota) are the bottleneck; don't fill the disk meanwhile
+                    logging.info(f"Upload backlog for {channel} is {backlog}; skipping its sources this cycle")
+                    continue
+                for source_url in self.sources[channel]:
+                    try:
+                        found, queued = downloader.stream_downloads(
+                            downloader.validate_url(source_url), downloader.get_channel_id(source_url),
+                            config["source_folder"], DOWNLOAD_THREADS, MAX_RETRIES,
+                            end_index=MAX_BACKLOG - backlog - 1, incremental=True
+                        )
+                        logging.info(f"Synced {source_url}: {found} seen, {queued} new")
+                    except Exception as e:
+                        logging.error(f"Sync of {source_url} failed: {str(e)}", exc_info=True)
+            self.stop_event.wait(POLL_INTERVAL)
+
+    def upload_loop(self, config):
+        channel = config["channel_id"]
+        tracking_file = os.path.join(uploader.TRACKING_DIR, f"uploaded_videos_{channel}.json")
+        interval = config.get("upload_interval", uploader.UPLOAD_INTERVAL)
+        youtube = None
+        credentials = None
+        while not self.stop_event.is_set():
+            item = self.queue.claim(channel, timeout=5)
+            if item is None:
+                continue
+            if uploader.is_video_uploaded(item["video_id"], tracking_file):
+                self.queue.done(item)
+                continue
+            if not os.path.exists(item["path"]):
+                logging.warning(f"Queued file vanished: {item['path']}")
+                item["attempts"] = self.queue.max_attempts
+                self.queue.fail(item, "file missing")
+                continue
+            if youtube is None:
+                try:
+                    youtube = uploader.authenticate_channel(config["client_secrets_file"], config["token_file"])
+                    credentials = uploader.load_credentials(config["client_secrets_file"], config["token_file"])
+                except BaseException as e:
+                    # load_credentials raises SystemExit; keep the channel alive until its token is fixed
+                    youtube = None
+                    self.queue.release(item)
+                    logging.error(f"{channel} cannot authenticate ({e}); retrying in {AUTH_RETRY_DELAY / 60:.0f} min")
+                    self.stop_event.wait(AUTH_RETRY_DELAY)
+                    continue
+            try:
+                uploader.refresh_credentials(credentials, config["token_file"])
+                if not uploader.upload_file(config, youtube, item["path"], item["video_id"], self.ledger):
+                    # Same content was already on the channel
+                    self.queue.done(item)
+                    continue
+                self.queue.done(item)
+                uploader.enforce_storage_budget(config)
+                logging.info(Fore.GREEN + f"{channel}: uploaded {os.path.basename(item['path'])} "
+                             f"{time.time() - item['enqueued_at']:.0f}s after download")
+                self.stop_event.wait(interval)
+            except uploader.QuotaExhausted as e:
+                self.queue.release(item)
+                wait = uploader.seconds_until_quota_reset()
+                logging.warning(Fore.YELLOW + f"{e}; {channel} resumes uploads in {wait / 3600:.1f}h")
+                self.stop_event.wait(wait)
+            except Exception as e:
+                state = self.queue.fail(item, e)
+                logging.error(f"Upload of {item['path']} to {channel} failed (attempt {item['attempts']}, {state}): {e}")
+                if state != FAILED:
+                    self.stop_event.wait(RETRY_DELAY)
+
+    def start(self):
+        # A background thread must not open a browser for a missing token
+        uploader.ALLOW_INTERACTIVE_AUTH = False
+        downloader.stop_requested.clear()
+        self.queue.recover()
+        self.seed()
+        downloader.download_listeners.append(self.on_download)
+        downloader.rate_limiter = downloader.TokenBucket(downloader.RATE_LIMIT_PER_SEC, downloader.RATE_LIMIT_BURST)
+        downloader.start_merge_stage()
+        # Register the uploader's view of each folder first, so downloads wait on
+        # the channel's own budget and evict only what that channel uploaded
+        for config in self.configs:
+            uploader.get_channel_storage(config)
+            downloader.UPLOAD_CHANNELS[folder_key(config["source_folder"])] = config["channel_id"]
+        uploader.refresh_all_credentials(self.configs)
+        self.download_thread = threading.Thread(target=self.download_loop, daemon=True)
+        self.download_thread.start()
+        for config in self.configs:
+            thread = threading.Thread(target=self.upload_loop, args=(config,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logging.info(f"Pipeline running for {len(self.configs)} channels")
+
+    def stop(self):
+        """Let in-flight uploads and downloads finish, then flush every store"""
+        self.stop_event.set()
+        # Queued downloads are skipped; they are still new on the next start
+        downloader.stop_requested.set()
+        for thread in self.threads:
+            thread.join()
+        # The merge stage and history store below must outlive the running sync
+        if self.download_thread is not None:
+            self.download_thread.join()
+        downloader.download_listeners.remove(self.on_download)
+        downloader.finish_merge_stage()
+        downloader.get_history_store().close()
+        downloader.close_ydl_pool()
+        close_preparer()
+        uploader.close_upload_trackers()
+        close_content_index()
+        close_work_queue()
+        self.queue.close()
+
+
+def main():
+    pipeline = Pipeline(uploader.CHANNELS_CONFIG, load_sources())
+    if not pipeline.configs:
+        logging.error(f"No upload channel has sources in {PIPELINE_SOURCES_FILE}")
+        return
+    if downloader.METRICS_PORT:
+        downloader.serve_metrics(downloader.metrics, downloader.METRICS_PORT)
+    pipeline.start()
+    try:
+        while not pipeline.stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        logging.info("Stopping pipeline, waiting for in-flight uploads")
+    pipeline.stop()
+
+if __name__ == "__main__":
+    main()
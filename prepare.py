@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, Future
+from content_index import get_content_index
+from storage import get_storage_manager
+from paths import TRACKING_DIR
+
+# Upload-side cache, so it lives with the uploader's tracking files
+PREPARED_DIR = os.path.join(TRACKING_DIR, "prepared")
+PREPARED_BUDGET_BYTES = 20 * 1024 ** 3   # Cached outputs beyond this are evicted, least recently used first
+PREPARE_WORKERS = os.cpu_count() or 2
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+
+MAX_LONG_SIDE = 1920                # Shorts are 1080x1920; larger frames are scaled down
+TARGET_VIDEO_BITRATE = 8_000_000    # bit/s, YouTube's recommendation for 1080p30 SDR
+TARGET_AUDIO_BITRATE = "128k"
+MIN_SAVING = 0.15                   # A transcode is kept only if it is at least this much smaller
+X264_PRESET = "medium"
+
+# Streams MP4 can carry as-is; anything else has to be transcoded
+COPY_VIDEO_CODECS = ("h264", "hevc", "av1", "mpeg4")
+COPY_AUDIO_CODECS = ("aac", "mp3", "ac3")
+
+
+def probe_media(path):
+    """Container and stream details from ffprobe"""
+    cmd = [FFPROBE_BINARY, "-v", "error", "-of", "json",
+           "-show_entries", "format=format_name,bit_rate,duration:stream=codec_type,codec_name,width,height,bit_rate",
+           path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe exited with {result.returncode}: {result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+def run_ffmpeg(args, output_path):
+    # Partial outputs must not look like media files to the cache eviction
+    tmp_path = output_path + ".part"
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + args
+    cmd += ["-movflags", "+faststart", "-f", "mp4", tmp_path]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr.strip()}")
+    os.replace(tmp_path, output_path)
+    return os.path.getsize(output_path)
+
+def needs_transcode(probe, video):
+    """Over the target bitrate (plus the saving margin) or the target resolution"""
+    bitrate = int(video.get("bit_rate") or probe.get("format", {}).get("bit_rate") or 0)
+    long_side = max(video.get("width") or 0, video.get("height") or 0)
+    return bitrate > TARGET_VIDEO_BITRATE * (1 + MIN_SAVING) or long_side > MAX_LONG_SIDE
+
+def prepare_file(source, output_path):
+    """Remux to faststart MP4, transcoding too when that saves enough
+
+    Runs in a worker process. Writes output_path plus a JSON sidecar with the
+    outcome, so a finished preparation is reused by later runs and channels.
+    """
+    started = time.monotonic()
+    original_bytes = os.path.getsize(source)
+    probe = probe_media(source)
+    streams = probe.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        raise RuntimeError("no video stream")
+    copyable = video.get("codec_name") in COPY_VIDEO_CODECS and all(
+        s.get("codec_name") in COPY_AUDIO_CODECS for s in streams if s.get("codec_type") == "audio"
+    )
+
+    action, prepared_bytes = None, None
+    if copyable:
+        prepared_bytes = run_ffmpeg(["-i", source, "-map", "0:v:0", "-map", "0:a?", "-c", "copy"], output_path)
+        action = "remux"
+    if not copyable or needs_transcode(probe, video):
+        transcoded_path = os.path.splitext(output_path)[0] + ".transcode"
+        scale = (f"scale=w='if(gte(iw,ih),min(iw,{MAX_LONG_SIDE}),-2)'"
+                 f":h='if(gte(iw,ih),-2,min(ih,{MAX_LONG_SIDE}))'")
+        transcoded_bytes = run_ffmpeg([
+            "-i", source, "-map", "0:v:0", "-map", "0:a?", "-vf", scale,
+            "-c:v", "libx264", "-preset", X264_PRESET, "-b:v", str(TARGET_VIDEO_BITRATE),
+            "-maxrate", str(int(TARGET_VIDEO_BITRATE * 1.5)), "-bufsize", str(TARGET_VIDEO_BITRATE * 2),
+            "-c:a", "aac", "-b:a", TARGET_AUDIO_BITRATE
+        ], transcoded_path)
+        if not copyable or transcoded_bytes <= prepared_bytes * (1 - MIN_SAVING):
+            os.replace(transcoded_path, output_path)
+            action, prepared_bytes = "transcode", transcoded_bytes
+        else:
+            os.remove(transcoded_path)
+
+    result = {
+        "action": action, "path": output_path, "source": source,
+        "original_bytes": original_bytes, "prepared_bytes": prepared_bytes,
+        "seconds": time.monotonic() - started
+    }
+    tmp_file = output_path + ".json.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_file, os.path.splitext(output_path)[0] + ".json")
+    return result
+
+
+class Preparer:
+    """Pre-upload remux/transcode on a process pool, cached by content hash
+
+    Outputs are named after the source's content hash, so retries and the
+    same clip posted to several channels reuse one preparation. Jobs for the
+    same hash that are already running are shared, not repeated.
+    """
+
+    def __init__(self, cache_dir=None, workers=PREPARE_WORKERS, budget_bytes=PREPARED_BUDGET_BYTES):
+        self.cache_dir = cache_dir or PREPARED_DIR
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.totals = {"files": 0, "original_bytes": 0, "prepared_bytes": 0, "seconds": 0.0}
+        self.storage = get_storage_manager(self.cache_dir, budget_bytes, lambda path: True)
+        self.available = bool(shutil.which(FFMPEG_BINARY) and shutil.which(FFPROBE_BINARY))
+        if not self.available:
+            logging.warning(f"{FFMPEG_BINARY}/{FFPROBE_BINARY} not found; uploading files as they are")
+
+    def cached(self, content_hash):
+        output_path = os.path.join(self.cache_dir, f"{content_hash}.mp4")
+        try:
+            with open(os.path.join(self.cache_dir, f"{content_hash}.json"), "r") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(output_path) or os.path.getsize(output_path) != result["prepared_bytes"]:
+            return None
+        return dict(result, path=output_path, cached=True)
+
+    def submit(self, path, content_hash):
+        """Future for the prepared result; cached and in-flight work is reused"""
+        with self.lock:
+            future = self.pending.get(content_hash)
+            if future is not None:
+                return future
+            result = self.cached(content_hash)
+            if result is not None:
+                future = Future()
+                future.set_result(result)
+                return future
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            future = self.pool.submit(prepare_file, os.path.abspath(path),
+                                      os.path.join(self.cache_dir, f"{content_hash}.mp4"))
+            self.pending[content_hash] = future
+            return future
+
+    def prefetch(self, paths):
+        """Start preparing files ahead of their uploads"""
+        if not self.available:
+            return
+        for path in paths:
+            try:
+                self.submit(path, get_content_index().hash_file(path))
+            except Exception as e:
+                logging.warning(f"Could not queue {path} for preparation: {e}")
+
+    def prepare(self, path, content_hash):
+        """Path to upload: the prepared file, or the original if preparation failed"""
+        if not self.available:
+            return path
+        try:
+            result = self.submit(path, content_hash).result()
+        except Exception as e:
+            with self.lock:
+                self.pending.pop(content_hash, None)
+            logging.warning(f"Preparation failed for {os.path.basename(path)}, uploading it as is: {e}")
+            return path
+        with self.lock:
+            # Whoever collects a fresh result first reports and accounts for it
+            fresh = self.pending.pop(content_hash, None) is not None and not result.get("cached")
+            if fresh:
+                self.totals["files"] += 1
+                self.totals["original_bytes"] += result["original_bytes"]
+                self.totals["prepared_bytes"] += result["prepared_bytes"]
+                self.totals["seconds"] += result["seconds"]
+        if fresh:
+            saved = result["original_bytes"] - result["prepared_bytes"]
+            logging.info(
+                f"Prepared {os.path.basename(path)} ({result['action']}): {result['original_bytes'] / 1e6:.1f} MB -> "
+                f"{result['prepared_bytes'] / 1e6:.1f} MB ({saved / result['original_bytes']:.0%} saved) "
+                f"in {result['seconds']:.1f}s"
+            )
+            if not self.storage.has_space():
+                self.storage.evict()
+        return result["path"]
+
+    def report(self):
+        totals = self.totals
+        saved = totals["original_bytes"] - totals["prepared_bytes"]
+        share = saved / totals["original_bytes"] if totals["original_bytes"] else 0
+        return (f"Prepared {totals['files']} files in {totals['seconds']:.0f}s of worker time, "
+                f"{saved / 1e6:.1f} MB saved ({share:.0%})")
+
+    def close(self):
+        """Drop queued preparations and wait for running ones"""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        if self.totals["files"]:
+            logging.info(self.report())
+
+
+_preparer = None
+_preparer_lock = threading.Lock()
+
+def get_preparer():
+    """Process-wide Preparer on PREPARED_DIR"""
+    global _preparer
+    with _preparer_lock:
+        if _preparer is None:
+            _preparer = Preparer()
+        return _preparer
+
+def close_preparer():
+    global _preparer
+    with _preparer_lock:
+        if _preparer is not None:
+            _preparer.close()
+            _preparer = None
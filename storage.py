@@ -0,0 +1,117 @@
+import os
+import time
+import logging
+import threading
+
+MEDIA_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4a")
+USAGE_TTL = 5.0          # Seconds a folder usage total is reused before rescanning
+LOW_WATERMARK = 0.9      # Eviction frees space down to this fraction of the budget
+WAIT_POLL = 30.0         # Seconds between checks while waiting for space
+
+
+class StorageManager:
+    """Byte budget for one media folder
+
+    Only files that is_evictable(path) accepts (i.e. already uploaded) are ever
+    deleted, least recently used first. When nothing can be evicted, callers of
+    wait_for_space block until uploads catch up.
+    """
+
+    def __init__(self, folder, budget_bytes, is_evictable, low_watermark=LOW_WATERMARK):
+        self.folder = folder
+        self.budget_bytes = budget_bytes
+        self.is_evictable = is_evictable
+        self.low_watermark = low_watermark
+        self.lock = threading.Lock()
+        self.usage_bytes = 0
+        self.scanned_at = 0.0
+
+    def _files(self):
+        files = []
+        if not os.path.isdir(self.folder):
+            return files
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        # Last use: read (when atime is maintained) or written
+                        files.append((max(stat.st_atime, stat.st_mtime), stat.st_size, entry.path))
+                except OSError:
+                    continue
+        return files
+
+    def usage(self, refresh=False):
+        with self.lock:
+            if refresh or time.monotonic() - self.scanned_at > USAGE_TTL:
+                self.usage_bytes = sum(size for _, size, _ in self._files())
+                self.scanned_at = time.monotonic()
+            return self.usage_bytes
+
+    def evict(self, needed=0):
+        """Delete uploaded files, oldest use first, until usage + needed fits under the low watermark"""
+        target = self.budget_bytes * self.low_watermark - needed
+        with self.lock:
+            files = self._files()
+            usage = sum(size for _, size, _ in files)
+            freed = []
+            for _, size, path in sorted(files):
+                if usage <= target:
+                    break
+                if not path.lower().endswith(MEDIA_EXTENSIONS):
+                    continue
+                try:
+                    if not self.is_evictable(path):
+                        continue
+                    os.remove(path)
+                except Exception as e:
+                    logging.warning(f"Could not evict {path}: {str(e)}")
+                    continue
+                usage -= size
+                freed.append(path)
+            self.usage_bytes = usage
+            self.scanned_at = time.monotonic()
+        if freed:
+            logging.info(f"Evicted {len(freed)} uploaded files from {self.folder}; {usage / 1e9:.2f} GB in use")
+        return freed
+
+    def has_space(self, needed=0):
+        if not self.budget_bytes:
+            return True
+        return self.usage() + needed <= self.budget_bytes
+
+    def wait_for_space(self, needed=0, stop_event=None):
+        """Block until needed more bytes fit in the budget, evicting what it can"""
+        if self.has_space(needed):
+            return True
+        waited = False
+        while True:
+            self.evict(needed)
+            if self.has_space(needed):
+                if waited:
+                    logging.info(f"Space available again in {self.folder}")
+                return True
+            if not waited:
+                logging.warning(
+                    f"{self.folder} is at its {self.budget_bytes / 1e9:.2f} GB budget with nothing uploaded "
+                    f"to evict; pausing downloads"
+                )
+                waited = True
+            if stop_event is not None:
+                if stop_event.wait(WAIT_POLL):
+                    return False
+            else:
+                time.sleep(WAIT_POLL)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_storage_manager(folder, budget_bytes, is_evictable):
+    """Process-wide StorageManager per folder"""
+    key = os.path.normcase(os.path.abspath(folder))
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = StorageManager(folder, budget_bytes, is_evictable)
+        return manager
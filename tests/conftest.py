@@ -0,0 +1,14 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+# The modules are flat scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep module-level state directories out of the real (Windows) defaults
+_state_dir = tempfile.mkdtemp(prefix="yt-tests-")
+atexit.register(shutil.rmtree, _state_dir, ignore_errors=True)
+os.environ.setdefault("YT_HISTORY_DIR", os.path.join(_state_dir, "history"))
+os.environ.setdefault("YT_TRACKING_DIR", os.path.join(_state_dir, "tracking"))
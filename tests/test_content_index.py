@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from content_index import ContentIndex, sampled_hash
+
+
+class ContentIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.index = ContentIndex(os.path.join(self.dir, "content_index.db"))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, folder, name, data):
+        os.makedirs(os.path.join(self.dir, folder), exist_ok=True)
+        path = os.path.join(self.dir, folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_same_content_is_found_under_another_name(self):
+        clip = os.urandom(2000)
+        first = self.write("x", "clip_aaa.mp4", clip)
+        second = self.write("x", "clip_bbb.mp4", clip)
+        other = self.write("x", "clip_ccc.mp4", os.urandom(2000))
+        content_hash, existing = self.index.add_file(first, "aaa")
+        self.assertIsNone(existing)
+        self.assertEqual(self.index.add_file(second, "bbb"), (content_hash, first))
+        self.assertIsNone(self.index.add_file(other, "ccc")[1])
+
+    def test_same_folder_ignores_copies_in_other_folders(self):
+        clip = os.urandom(2000)
+        copy_x = self.write("x", "clip_aaa.mp4", clip)
+        copy_y = self.write("y", "clip_aaa.mp4", clip)
+        self.index.add_file(copy_x)
+        self.assertIsNone(self.index.add_file(copy_y, same_folder=True)[1])
+        # Without same_folder any indexed copy counts
+        self.assertEqual(self.index.add_file(copy_y)[1], copy_x)
+
+    def test_deleted_copy_is_forgotten(self):
+        clip = os.urandom(2000)
+        gone = self.write("x", "clip_aaa.mp4", clip)
+        self.index.add_file(gone)
+        os.remove(gone)
+        kept = self.write("x", "clip_bbb.mp4", clip)
+        self.assertIsNone(self.index.add_file(kept)[1])
+        self.assertIsNone(self.index.db.execute("SELECT 1 FROM files WHERE path = ?", (gone,)).fetchone())
+
+    def test_uploads_are_per_channel(self):
+        path = self.write("x", "clip_aaa.mp4", os.urandom(2000))
+        content_hash, _ = self.index.add_file(path)
+        self.index.mark_uploaded(content_hash, "chanY", "yt1")
+        self.assertEqual(self.index.uploaded_to(content_hash, "chanY"), "yt1")
+        self.assertIsNone(self.index.uploaded_to(content_hash, "chanX"))
+        self.assertTrue(self.index.was_uploaded(path, "chanY"))
+        self.assertFalse(self.index.was_uploaded(path, "chanX"))
+
+    def test_sampled_hash_reads_large_files_in_samples(self):
+        data = bytearray(os.urandom(2 * 1024 * 1024))
+        path = self.write("x", "big.mp4", bytes(data))
+        before = sampled_hash(path)
+        # A byte between two samples is not read; one inside a sample is
+        data[100 * 1024] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(bytes(data))
+        self.assertEqual(sampled_hash(path), before)
+        data[0] ^= 0xFF
+        with open(path, "wb") as f:
+            f.write(bytes(data))
+        self.assertNotEqual(sampled_hash(path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
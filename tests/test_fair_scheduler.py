@@ -0,0 +1,55 @@
+import threading
+import unittest
+
+from ScrapperDS import FairScheduler
+
+
+class FairSchedulerTest(unittest.TestCase):
+    def test_round_robin_across_channels(self):
+        scheduler = FairScheduler(per_channel_limit=10)
+        for channel_id in ("a", "b", "c"):
+            scheduler.register(channel_id)
+        for n in range(3):
+            scheduler.put("a", f"a{n}")
+        scheduler.put("b", "b0")
+        scheduler.put("c", "c0")
+        scheduler.put("c", "c1")
+        for channel_id in ("a", "b", "c"):
+            scheduler.close(channel_id)
+        order = []
+        while (job := scheduler.get()) is not None:
+            order.append(job[1])
+        self.assertEqual(order, ["a0", "b0", "c0", "a1", "c1", "a2"])
+
+    def test_full_channel_blocks_only_its_producer(self):
+        scheduler = FairScheduler(per_channel_limit=2)
+        scheduler.register("big")
+        scheduler.register("small")
+        scheduler.put("big", 1)
+        scheduler.put("big", 2)
+        blocked = threading.Thread(target=scheduler.put, args=("big", 3), daemon=True)
+        blocked.start()
+        blocked.join(0.1)
+        self.assertTrue(blocked.is_alive())
+
+        # Another channel is still accepted and served next
+        scheduler.put("small", "s")
+        self.assertEqual(scheduler.get(), ("big", 1))
+        self.assertEqual(scheduler.get(), ("small", "s"))
+        blocked.join(1)
+        self.assertFalse(blocked.is_alive())
+
+    def test_get_waits_for_open_channels_and_ends_when_closed(self):
+        scheduler = FairScheduler()
+        scheduler.register("a")
+        results = []
+        consumer = threading.Thread(target=lambda: results.extend([scheduler.get(), scheduler.get()]))
+        consumer.start()
+        scheduler.put("a", "x")
+        scheduler.close("a")
+        consumer.join(1)
+        self.assertEqual(results, [("a", "x"), None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from journal import Journal
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.snapshot_file = os.path.join(self.dir, "history.json")
+        self.journals = []
+
+    def tearDown(self):
+        for journal in self.journals:
+            journal.close(compact=False)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open(self, **kwargs):
+        journal = Journal(self.snapshot_file, fsync_interval=60, **kwargs)
+        self.journals.append(journal)
+        return journal
+
+    def journal_lines(self):
+        with open(f"{self.snapshot_file}.journal", "r") as f:
+            return f.read().splitlines()
+
+    def test_compact_folds_journal_into_snapshot(self):
+        with open(self.snapshot_file, "w") as f:
+            json.dump({"chan": ["old"]}, f)
+        journal = self.open()
+        self.assertEqual(journal.load(), {"chan": {"old"}})
+        journal.append("chan", ["a", "b"])
+        journal.append("other", ["c"])
+        self.assertEqual(len(self.journal_lines()), 3)
+
+        data = journal.compact()
+        self.assertEqual(data, {"chan": {"old", "a", "b"}, "other": {"c"}})
+        self.assertEqual(self.journal_lines(), [])
+        self.assertEqual(journal.journal_lines, 0)
+        with open(self.snapshot_file, "r") as f:
+            self.assertEqual(json.load(f), {"chan": ["a", "b", "old"], "other": ["c"]})
+
+        # Appends after compaction land in the truncated journal
+        journal.append("chan", ["d"])
+        self.assertEqual(self.journal_lines(), ['["chan", "d"]'])
+        journal.close()
+        self.assertEqual(self.open().load(), {"chan": {"old", "a", "b", "d"}, "other": {"c"}})
+
+    def test_compaction_keeps_other_writers_lines(self):
+        # Two handles on one snapshot stand in for two processes
+        first, second = self.open(), self.open()
+        first.load()
+        second.load()
+        first.append("chan", ["a"])
+        second.append("chan", ["b"])
+        first.compact()
+        second.append("chan", ["c"])
+        self.assertEqual(self.journal_lines(), ['["chan", "c"]'])
+        self.assertEqual(self.open().load(), {"chan": {"a", "b", "c"}})
+
+    def test_list_key_snapshot(self):
+        with open(self.snapshot_file, "w") as f:
+            json.dump(["x"], f)
+        journal = self.open(list_key="uploaded")
+        self.assertEqual(journal.load(), {"uploaded": {"x"}})
+        journal.append("uploaded", ["y"])
+        journal.compact()
+        with open(self.snapshot_file, "r") as f:
+            self.assertEqual(json.load(f), ["x", "y"])
+
+    def test_corrupt_line_is_skipped(self):
+        journal = self.open()
+        journal.load()
+        journal.append("chan", ["a"])
+        with open(f"{self.snapshot_file}.journal", "a") as f:
+            f.write('["chan", "tor')
+        self.assertEqual(self.open().load(), {"chan": {"a"}})
+
+    def test_compact_after_threshold_triggers_background_compaction(self):
+        journal = self.open(compact_after=3)
+        journal.load()
+        journal.append("chan", ["a", "b", "c"])
+        self.assertTrue(journal.compact_event.is_set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import uploaderCP as uploader
+
+
+class QuotaTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.ledger = uploader.QuotaLedger(os.path.join(self.dir, "quota_ledger.json"))
+        self.pending = {}
+        patcher = mock.patch.object(
+            uploader, "get_pending_video_files",
+            lambda folder, tracking_file, limit=None: self.pending[folder][:limit]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def config(self, channel_id, project, pending, **overrides):
+        secrets_file = os.path.join(self.dir, f"{project}.json")
+        with open(secrets_file, "w") as f:
+            json.dump({"installed": {"client_id": project}}, f)
+        folder = os.path.join(self.dir, channel_id)
+        self.pending[folder] = [(f"{folder}/{n}.mp4", f"v{n}") for n in range(pending)]
+        return {"channel_id": channel_id, "client_secrets_file": secrets_file, "source_folder": folder,
+                "max_uploads_per_run": 10, "daily_quota": 10000, "upload_quota_cost": 1600, **overrides}
+
+    def test_channels_sharing_a_project_split_its_quota(self):
+        configs = [self.config("a", "p1", 5), self.config("b", "p1", 5), self.config("c", "p2", 2)]
+        # 10000 // 1600 = 6 uploads per project, handed out in turns
+        self.assertEqual(uploader.plan_uploads(configs, self.ledger), {"a": 3, "b": 3, "c": 2})
+
+    def test_unused_share_goes_to_the_other_channels(self):
+        configs = [self.config("a", "p1", 1), self.config("b", "p1", 8)]
+        self.assertEqual(uploader.plan_uploads(configs, self.ledger), {"a": 1, "b": 5})
+
+    def test_plan_follows_the_ledger(self):
+        configs = [self.config("a", "p1", 5)]
+        self.assertTrue(self.ledger.reserve("p1", 1600 * 4, 10000))
+        self.assertEqual(uploader.plan_uploads(configs, self.ledger), {"a": 2})
+        self.ledger.exhaust("p1", 10000)
+        self.assertEqual(uploader.plan_uploads(configs, self.ledger), {"a": 0})
+
+    def test_reserve_stops_at_the_daily_quota(self):
+        self.assertTrue(self.ledger.reserve("p1", 6000, 10000))
+        self.assertFalse(self.ledger.reserve("p1", 6000, 10000))
+        self.assertTrue(self.ledger.reserve("p1", 4000, 10000))
+        self.assertEqual(self.ledger.used("p1"), 10000)
+        self.assertEqual(self.ledger.used("p2"), 0)
+
+    def test_usage_resets_on_a_new_quota_day(self):
+        self.ledger.reserve("p1", 6000, 10000)
+        with mock.patch.object(uploader, "quota_day", return_value="2099-01-01"):
+            self.assertEqual(self.ledger.used("p1"), 0)
+            self.assertTrue(self.ledger.reserve("p1", 6000, 10000))
+
+
+class QuotaErrorTest(unittest.TestCase):
+    def error(self, reason, status=403):
+        import httplib2
+        from googleapiclient.errors import HttpError
+        content = json.dumps({"error": {"errors": [{"reason": reason}]}}).encode()
+        return HttpError(httplib2.Response({"status": status}), content)
+
+    def test_only_daily_quota_errors_exhaust_the_project(self):
+        for reason in ("quotaExceeded", "dailyLimitExceeded"):
+            self.assertTrue(uploader.is_quota_error(self.error(reason)))
+        for reason in ("rateLimitExceeded", "userRateLimitExceeded", "uploadLimitExceeded"):
+            self.assertFalse(uploader.is_quota_error(self.error(reason)))
+        self.assertFalse(uploader.is_quota_error(self.error("quotaExceeded", status=400)))
+
+    def test_rate_limited_chunk_is_retried(self):
+        request = mock.Mock()
+        request.next_chunk.side_effect = [self.error("rateLimitExceeded"), (None, {"id": "yt1"})]
+        with mock.patch.object(uploader.send_next_chunk.retry, "sleep", lambda seconds: None):
+            self.assertEqual(uploader.send_next_chunk(request), (None, {"id": "yt1"}))
+        self.assertEqual(request.next_chunk.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import StorageManager
+from content_index import ContentIndex
+
+
+class StorageManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.index = ContentIndex(os.path.join(self.dir, "content_index.db"))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def write(self, folder, name, data, used_at):
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        os.utime(path, (used_at, used_at))
+        return path
+
+    def manager(self, folder, channel_id, budget_bytes):
+        return StorageManager(folder, budget_bytes, lambda path: self.index.was_uploaded(path, channel_id))
+
+    def test_copy_uploaded_elsewhere_is_kept(self):
+        folder_x = os.path.join(self.dir, "x")
+        folder_y = os.path.join(self.dir, "y")
+        clip = os.urandom(1000)
+        copy_x = self.write(folder_x, "clip_aaa.mp4", clip, 1000)
+        copy_y = self.write(folder_y, "clip_aaa.mp4", clip, 1000)
+        content_hash, _ = self.index.add_file(copy_x)
+        self.index.add_file(copy_y)
+        self.index.mark_uploaded(content_hash, "chanY", "yt1")
+
+        storage_x = self.manager(folder_x, "chanX", 500)
+        self.assertFalse(storage_x.has_space())
+        self.assertEqual(storage_x.evict(), [])
+        self.assertTrue(os.path.exists(copy_x))
+        self.assertEqual(self.manager(folder_y, "chanY", 500).evict(), [copy_y])
+
+        self.index.mark_uploaded(content_hash, "chanX", "yt2")
+        self.assertEqual(storage_x.evict(), [copy_x])
+
+    def test_evicts_least_recently_used_down_to_low_watermark(self):
+        folder = os.path.join(self.dir, "x")
+        paths = [self.write(folder, f"clip_{n}.mp4", os.urandom(100), 1000 + n) for n in range(5)]
+        notes = self.write(folder, "notes.txt", os.urandom(100), 0)
+        for path in paths:
+            self.index.mark_uploaded(self.index.add_file(path)[0], "chanX", path)
+        self.index.add_file(notes)
+
+        storage = self.manager(folder, "chanX", 400)
+        # 600 bytes in use; the low watermark is 360, so the three oldest clips go
+        self.assertEqual(storage.evict(), paths[:3])
+        self.assertTrue(os.path.exists(notes))
+        self.assertEqual(storage.usage(refresh=True), 300)
+        self.assertTrue(storage.has_space())
+
+    def test_no_budget_always_has_space(self):
+        folder = os.path.join(self.dir, "x")
+        self.write(folder, "clip_a.mp4", os.urandom(100), 1000)
+        storage = self.manager(folder, "chanX", None)
+        self.assertTrue(storage.has_space(10 ** 12))
+        self.assertTrue(storage.wait_for_space(10 ** 12))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from upload_queue import UploadQueue, QUEUED, UPLOADING, DONE, FAILED
+
+
+class UploadQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.dir, "upload_queue.db")
+        self.queue = UploadQueue(self.db_file, max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def state(self, item):
+        return self.queue.db.execute("SELECT state FROM uploads WHERE id = ?", (item["id"],)).fetchone()[0]
+
+    def test_claims_oldest_first_per_channel(self):
+        self.assertTrue(self.queue.put("a", "v1", "/a/1.mp4"))
+        self.assertFalse(self.queue.put("a", "v1", "/a/1.mp4"))
+        self.queue.put("b", "v2", "/b/2.mp4")
+        self.queue.put("a", "v3", "/a/3.mp4")
+        self.assertEqual(self.queue.depth(), 3)
+        self.assertEqual(self.queue.claim("a", timeout=0)["video_id"], "v1")
+        self.assertEqual(self.queue.claim("a", timeout=0)["video_id"], "v3")
+        self.assertIsNone(self.queue.claim("a", timeout=0))
+        # Claimed items still count towards the backlog until they are done
+        self.assertEqual(self.queue.depth("a"), 2)
+
+    def test_claim_waits_for_put(self):
+        claimed = []
+        waiter = threading.Thread(target=lambda: claimed.append(self.queue.claim("a", timeout=5)))
+        waiter.start()
+        self.queue.put("a", "v1", "/a/1.mp4")
+        waiter.join(5)
+        self.assertEqual(claimed[0]["path"], "/a/1.mp4")
+
+    def test_recover_requeues_interrupted_claims(self):
+        self.queue.put("a", "v1", "/a/1.mp4")
+        item = self.queue.claim("a", timeout=0)
+        self.queue.close()
+        # A restart after a crash mid-upload
+        self.queue = UploadQueue(self.db_file, max_attempts=2)
+        self.assertEqual(self.state(item), UPLOADING)
+        self.assertEqual(self.queue.recover(), 1)
+        again = self.queue.claim("a", timeout=0)
+        self.assertEqual((again["id"], again["attempts"]), (item["id"], 2))
+
+    def test_fail_requeues_until_max_attempts(self):
+        self.queue.put("a", "v1", "/a/1.mp4")
+        item = self.queue.claim("a", timeout=0)
+        self.assertEqual(self.queue.fail(item, RuntimeError("boom")), QUEUED)
+        item = self.queue.claim("a", timeout=0)
+        self.assertEqual(self.queue.fail(item, "boom"), FAILED)
+        self.assertIsNone(self.queue.claim("a", timeout=0))
+        self.assertEqual(self.queue.depth("a"), 0)
+
+    def test_release_does_not_count_the_attempt(self):
+        self.queue.put("a", "v1", "/a/1.mp4")
+        for _ in range(3):
+            item = self.queue.claim("a", timeout=0)
+            self.queue.release(item)
+        item = self.queue.claim("a", timeout=0)
+        self.assertEqual(item["attempts"], 1)
+        self.queue.done(item)
+        self.assertEqual(self.state(item), DONE)
+        self.assertEqual(self.queue.depth(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import ScrapperDS as downloader
+
+
+class WatermarkTest(unittest.TestCase):
+    """Incremental syncs against a fake newest-first playlist"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.playlist = [f"vid{n:08d}" for n in range(100, 0, -1)]
+        self.paged = 0
+        self.downloaded = set()
+        for target, value in (
+            ("WATERMARK_FILE", os.path.join(self.dir, "channel_watermarks.json")),
+            ("iter_video_urls", self.fake_playlist),
+            ("is_video_downloaded", lambda channel_id, video_id: video_id in self.downloaded),
+        ):
+            patcher = mock.patch.object(downloader, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def fake_playlist(self, target_url, max_retries, state=None):
+        for video_id in list(self.playlist):
+            self.paged += 1
+            yield f"https://www.youtube.com/shorts/{video_id}"
+
+    def sync(self, room=None, fail=False):
+        """One stream_downloads-like pass taking at most room new entries"""
+        self.paged = 0
+        state = {}
+        new = []
+        for url in downloader.iter_incremental_urls("url", "chan", 1, state):
+            video_id = downloader.extract_video_id(url)
+            if video_id in self.downloaded:
+                continue
+            new.append(video_id)
+            if not fail:
+                self.downloaded.add(video_id)
+            if room is not None and len(new) >= room:
+                state['truncated'] = True
+                break
+        if not fail:
+            downloader.commit_watermark("chan", state)
+        return new
+
+    def test_complete_sync_stops_at_watermark(self):
+        self.assertEqual(len(self.sync()), 100)
+        self.playlist[:0] = ["new00000002", "new00000001"]
+        self.assertEqual(self.sync(), ["new00000002", "new00000001"])
+        self.assertEqual(self.paged, 3)
+        self.assertEqual(downloader.load_watermark("chan")["newest_id"], "new00000002")
+
+    def test_failed_sync_keeps_old_watermark(self):
+        self.sync()
+        self.playlist[:0] = ["new00000001"]
+        self.assertEqual(self.sync(fail=True), ["new00000001"])
+        self.assertEqual(downloader.load_watermark("chan")["newest_id"], "vid00000100")
+        self.assertEqual(self.sync(), ["new00000001"])
+
+    def test_truncated_syncs_resume_below_the_cursor(self):
+        self.assertEqual(self.sync(room=30)[-1], "vid00000071")
+        mark = downloader.load_watermark("chan")
+        self.assertEqual((mark["newest_id"], mark["resume_id"]), ("vid00000100", "vid00000071"))
+        self.assertFalse(downloader.needs_full_scan(mark))
+
+        self.assertEqual(self.sync(room=30), [f"vid{n:08d}" for n in range(70, 40, -1)])
+        self.assertEqual(downloader.load_watermark("chan")["resume_id"], "vid00000041")
+        self.assertEqual(len(self.sync(room=60)), 40)
+        mark = downloader.load_watermark("chan")
+        self.assertNotIn("resume_id", mark)
+        self.assertEqual(mark["newest_id"], "vid00000100")
+
+        # Back to plain incremental syncs
+        self.assertEqual(self.sync(room=30), [])
+        self.assertEqual(self.paged, 1)
+
+    def test_new_entries_come_first_while_resuming(self):
+        self.sync(room=30)
+        self.playlist[:0] = ["new00000001"]
+        self.assertEqual(self.sync(room=3), ["new00000001", "vid00000070", "vid00000069"])
+        mark = downloader.load_watermark("chan")
+        self.assertEqual((mark["newest_id"], mark["resume_id"]), ("new00000001", "vid00000069"))
+
+    def test_truncated_incremental_sync_stops_at_old_watermark(self):
+        self.sync()
+        self.playlist[:0] = [f"new{n:08d}" for n in range(40, 0, -1)]
+        self.sync(room=30)
+        mark = downloader.load_watermark("chan")
+        self.assertEqual((mark["resume_id"], mark["resume_until"]), ("new00000011", "vid00000100"))
+        self.assertEqual(len(self.sync(room=30)), 10)
+        # Paged to the old watermark, not through the whole back catalogue
+        self.assertEqual(self.paged, 41)
+        self.assertNotIn("resume_id", downloader.load_watermark("chan"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from work_queue import LeaseQueue, DOWNLOAD, UPLOAD
+
+
+class LeaseQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.dir, "work_queue.db")
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def node(self, node_id, lease_seconds=600):
+        queue = LeaseQueue(self.db_file, node_id=node_id, lease_seconds=lease_seconds)
+        self.queues.append(queue)
+        return queue
+
+    def test_live_lease_blocks_other_nodes(self):
+        a, b = self.node("a"), self.node("b")
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        self.assertFalse(b.claim(DOWNLOAD, "chan", "vid1"))
+        # The owner may claim its own job again, e.g. on a retry
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        # Kinds and channels are separate jobs
+        self.assertTrue(b.claim(UPLOAD, "chan", "vid1"))
+        self.assertTrue(b.claim(DOWNLOAD, "other", "vid1"))
+
+    def test_expired_lease_is_reclaimed(self):
+        a, b = self.node("a", lease_seconds=0.05), self.node("b")
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        time.sleep(0.1)
+        self.assertTrue(b.claim(DOWNLOAD, "chan", "vid1"))
+        owner, attempts = b.db.execute(
+            "SELECT owner, attempts FROM leases WHERE video_id = 'vid1'"
+        ).fetchone()
+        self.assertEqual((owner, attempts), ("b", 2))
+        # b's lease is live, so a cannot take it back
+        self.assertFalse(a.claim(DOWNLOAD, "chan", "vid1"))
+
+    def test_complete_blocks_later_claims(self):
+        a, b = self.node("a", lease_seconds=0.05), self.node("b")
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        a.complete(DOWNLOAD, "chan", "vid1")
+        time.sleep(0.1)
+        self.assertTrue(b.is_done(DOWNLOAD, "chan", "vid1"))
+        self.assertFalse(b.claim(DOWNLOAD, "chan", "vid1"))
+        self.assertFalse(a.claim(DOWNLOAD, "chan", "vid1"))
+        self.assertFalse(b.is_done(UPLOAD, "chan", "vid1"))
+        self.assertEqual(a.held, set())
+        self.assertEqual(a.db.execute("SELECT COUNT(*) FROM leases").fetchone()[0], 0)
+
+    def test_release_lets_another_node_claim(self):
+        a, b = self.node("a"), self.node("b")
+        self.assertTrue(a.claim(UPLOAD, "chan", "vid1"))
+        a.release(UPLOAD, "chan", "vid1")
+        self.assertEqual(a.held, set())
+        self.assertTrue(b.claim(UPLOAD, "chan", "vid1"))
+        self.assertFalse(b.is_done(UPLOAD, "chan", "vid1"))
+
+    def test_release_does_not_drop_a_reclaimed_lease(self):
+        a, b = self.node("a", lease_seconds=0.05), self.node("b")
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        time.sleep(0.1)
+        self.assertTrue(b.claim(DOWNLOAD, "chan", "vid1"))
+        # A late release from the node that lost the lease must not free b's claim
+        a.release(DOWNLOAD, "chan", "vid1")
+        self.assertFalse(self.node("c").claim(DOWNLOAD, "chan", "vid1"))
+
+    def test_close_releases_held_leases(self):
+        a, b = self.node("a"), self.node("b")
+        self.assertTrue(a.claim(DOWNLOAD, "chan", "vid1"))
+        self.queues.remove(a)
+        a.close()
+        self.assertTrue(b.claim(DOWNLOAD, "chan", "vid1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
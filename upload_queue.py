@@ -0,0 +1,123 @@
+import time
+import sqlite3
+import logging
+import threading
+
+# Item states
+QUEUED = "queued"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+
+
+class UploadQueue:
+    """Durable per-channel FIFO of finished downloads waiting for upload
+
+    Backed by SQLite in WAL mode so items survive crashes and restarts. An item
+    is claimed before it is uploaded; claims left behind by a crash go back to
+    the queue on the next start.
+    """
+
+    def __init__(self, db_file, max_attempts=5):
+        self.db_file = db_file
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.db = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " channel_id TEXT NOT NULL,"
+            " video_id TEXT,"
+            " path TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " enqueued_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " UNIQUE (channel_id, path))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS uploads_pending ON uploads (channel_id, state, id)")
+
+    def recover(self):
+        """Return items claimed by a process that died mid-upload to the queue"""
+        with self.lock:
+            count = self.db.execute(
+                "UPDATE uploads SET state = ?, updated_at = ? WHERE state = ?",
+                (QUEUED, time.time(), UPLOADING)
+            ).rowcount
+        if count:
+            logging.info(f"Recovered {count} interrupted uploads")
+        return count
+
+    def put(self, channel_id, video_id, path):
+        """Queue a file once; returns False if it is already known"""
+        now = time.time()
+        with self.changed:
+            added = self.db.execute(
+                "INSERT OR IGNORE INTO uploads (channel_id, video_id, path, state, enqueued_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (channel_id, video_id, path, QUEUED, now, now)
+            ).rowcount
+            if added:
+                self.changed.notify_all()
+        return bool(added)
+
+    def claim(self, channel_id, timeout=None):
+        """Oldest queued item for a channel as a dict, waiting up to timeout seconds"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.changed:
+            while True:
+                row = self.db.execute(
+                    "SELECT id, video_id, path, attempts, enqueued_at FROM uploads"
+                    " WHERE channel_id = ? AND state = ? ORDER BY id LIMIT 1",
+                    (channel_id, QUEUED)
+                ).fetchone()
+                if row:
+                    self.db.execute(
+                        "UPDATE uploads SET state = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (UPLOADING, time.time(), row[0])
+                    )
+                    return {"id": row[0], "channel_id": channel_id, "video_id": row[1], "path": row[2],
+                            "attempts": row[3] + 1, "enqueued_at": row[4]}
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+    def done(self, item):
+        with self.lock:
+            self.db.execute("UPDATE uploads SET state = ?, error = NULL, updated_at = ? WHERE id = ?",
+                            (DONE, time.time(), item["id"]))
+
+    def release(self, item):
+        """Put a claimed item back without counting the attempt (e.g. out of quota)"""
+        with self.changed:
+            self.db.execute("UPDATE uploads SET state = ?, attempts = attempts - 1, updated_at = ? WHERE id = ?",
+                            (QUEUED, time.time(), item["id"]))
+            self.changed.notify_all()
+
+    def fail(self, item, error):
+        """Requeue a failed upload, or park it once it has used max_attempts"""
+        state = FAILED if item["attempts"] >= self.max_attempts else QUEUED
+        with self.changed:
+            self.db.execute("UPDATE uploads SET state = ?, error = ?, updated_at = ? WHERE id = ?",
+                            (state, str(error)[:500], time.time(), item["id"]))
+            self.changed.notify_all()
+        return state
+
+    def depth(self, channel_id=None):
+        """Items queued or in flight, for one channel or all of them"""
+        query = "SELECT COUNT(*) FROM uploads WHERE state IN (?, ?)"
+        params = [QUEUED, UPLOADING]
+        if channel_id is not None:
+            query += " AND channel_id = ?"
+            params.append(channel_id)
+        with self.lock:
+            return self.db.execute(query, params).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.db.close()
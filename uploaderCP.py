@@ -1,23 +1,33 @@
 import os
 import json
+import hashlib
+import sqlite3
 import logging
-from datetime import datetime
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import requests
-from googleapiclient.errors import HttpError
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from colorama import Fore, Style, init
+from journal import Journal, file_lock
+from paths import TRACKING_DIR
+from content_index import get_content_index, close_content_index
+from storage import get_storage_manager
+from work_queue import get_work_queue, close_work_queue, UPLOAD
+from prepare import get_preparer, close_preparer
+# The Google client libraries are imported where they are used, so planning
+# and tracking queries start without loading them
 
 # Configuration and Constants
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.force-ssl"]
 VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv")
-TRACKING_DIR = r"C:\Users\meetd\Desktop\YT root\Core\source code"
+# TRACKING_DIR (YT_TRACKING_DIR) comes from paths.py, shared with prepare.py
+
+# Per-channel scheduling defaults, overridable in each channel's config
+MAX_UPLOADS_PER_RUN = 3   # Pending files drained per channel per run
+UPLOAD_INTERVAL = 60      # Seconds between two uploads on the same channel
 
 init(autoreset=True)
 
@@ -45,44 +55,154 @@ def extract_video_id(filename):
         logging.warning(f"Failed to extract ID from {filename}: {str(e)}")
         return None
 
+class UploadTracker:
+    """In-memory set of uploaded IDs backed by the tracking file plus a journal
+
+    The tracking file keeps its plain JSON list layout; additions are appended
+    to a sidecar journal under a file lock so concurrent uploaders never
+    rewrite each other's entries, and are folded back into the list on close.
+    """
+
+    def __init__(self, tracking_file):
+        os.makedirs(os.path.dirname(tracking_file), exist_ok=True)
+        self.lock = threading.Lock()
+        self.journal = Journal(tracking_file, list_key="uploaded")
+        self.ids = self.journal.load().get("uploaded", set())
+
+    def contains(self, video_id):
+        return video_id in self.ids
+
+    def add(self, video_id):
+        with self.lock:
+            if video_id in self.ids:
+                return
+            self.ids.add(video_id)
+            self.journal.append("uploaded", [video_id])
+
+    def close(self):
+        self.journal.close()
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+def get_upload_tracker(tracking_file):
+    """Process-wide UploadTracker for a tracking file"""
+    key = os.path.abspath(tracking_file)
+    with _trackers_lock:
+        if key not in _trackers:
+            _trackers[key] = UploadTracker(tracking_file)
+        return _trackers[key]
+
+def close_upload_trackers():
+    with _trackers_lock:
+        for tracker in _trackers.values():
+            tracker.close()
+        _trackers.clear()
+
 def is_video_uploaded(video_id, tracking_file):
     """Checks if video ID exists in tracking file"""
     if not video_id:
         return False
-    if os.path.exists(tracking_file):
-        with open(tracking_file, "r") as f:
-            return video_id in json.load(f)
-    return False
+    return get_upload_tracker(tracking_file).contains(video_id)
 
 def log_uploaded_video(video_id, tracking_file):
     """Adds YouTube video ID to tracking file"""
-    os.makedirs(os.path.dirname(tracking_file), exist_ok=True)
-    uploaded = set()
-    if os.path.exists(tracking_file):
-        with open(tracking_file, "r") as f:
-            uploaded = set(json.load(f))
-    uploaded.add(video_id)
-    with open(tracking_file, "w") as f:
-        json.dump(list(uploaded), f)    
+    get_upload_tracker(tracking_file).add(video_id)
 
 
 # Function: Authenticate per Channel
 
 
-def authenticate_channel(client_secrets_file, token_file):
-    """Authenticates a channel with automatic token management"""
+DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/youtube/v3/rest"
+DISCOVERY_CACHE_FILE = os.path.join(TRACKING_DIR, "youtube_v3_discovery.json")
+DISCOVERY_CACHE_TTL = 7 * 24 * 3600
+ALLOW_INTERACTIVE_AUTH = True   # Headless runs fail fast instead of opening a browser
+TOKEN_REFRESH_MARGIN = 300   # Refresh access tokens this many seconds before they expire
+
+_discovery_document = None
+_discovery_lock = threading.Lock()
+_credentials = {}
+_credentials_lock = threading.Lock()
+_auth_session = None   # Pooled connections for every token refresh
+
+
+def get_auth_session():
+    global _auth_session
+    with _credentials_lock:
+        if _auth_session is None:
+            import requests
+            _auth_session = requests.Session()
+        return _auth_session
+
+def get_discovery_document():
+    """YouTube v3 discovery document text, fetched once per process and cached on disk
+
+    Kept as text: build_from_document parses it per client, and the API client
+    mutates the parsed dict, so one dict cannot be shared across channels.
+    """
+    global _discovery_document
+    import requests
+    from googleapiclient import discovery_cache
+    with _discovery_lock:
+        if _discovery_document is not None:
+            return _discovery_document
+        cached = None
+        if os.path.exists(DISCOVERY_CACHE_FILE):
+            with open(DISCOVERY_CACHE_FILE, "r") as f:
+                cached = f.read()
+            if time.time() - os.path.getmtime(DISCOVERY_CACHE_FILE) < DISCOVERY_CACHE_TTL:
+                _discovery_document = cached
+                return _discovery_document
+        try:
+            response = get_auth_session().get(DISCOVERY_URL, timeout=30)
+            response.raise_for_status()
+            _discovery_document = response.text
+            os.makedirs(os.path.dirname(DISCOVERY_CACHE_FILE), exist_ok=True)
+            tmp_file = f"{DISCOVERY_CACHE_FILE}.tmp"
+            with open(tmp_file, "w") as f:
+                f.write(_discovery_document)
+            os.replace(tmp_file, DISCOVERY_CACHE_FILE)
+        except (requests.RequestException, OSError) as e:
+            # A stale copy, or the one bundled with googleapiclient, still works
+            logging.warning(f"Could not refresh discovery document: {str(e)}")
+            _discovery_document = cached or discovery_cache.get_static_doc("youtube", "v3")
+        return _discovery_document
+
+def build_youtube(credentials=None, http=None):
+    """API client from the cached discovery document"""
+    from googleapiclient.discovery import build_from_document
+    return build_from_document(get_discovery_document(), credentials=credentials, http=http)
+
+def refresh_credentials(credentials, token_file):
+    """Refresh if the token expires within TOKEN_REFRESH_MARGIN and save it"""
+    if not credentials.refresh_token:
+        return False
+    if credentials.expiry and credentials.expiry - datetime.now(timezone.utc).replace(tzinfo=None) > timedelta(seconds=TOKEN_REFRESH_MARGIN):
+        return False
+    from google.auth.transport.requests import Request
+    credentials.refresh(Request(get_auth_session()))
+    with open(token_file, "w") as token:
+        token.write(credentials.to_json())
+    return True
+
+def load_credentials(client_secrets_file, token_file):
+    """Cached credentials for a token file, loading and refreshing them once"""
+    with _credentials_lock:
+        credentials = _credentials.get(token_file)
+    if credentials is not None:
+        return credentials
+
     # Ensure directories exist for token files
     os.makedirs(os.path.dirname(token_file), exist_ok=True)
-    
-    credentials = None
-    
+
     # Load existing credentials if available
     if os.path.exists(token_file):
         try:
+            from google.oauth2.credentials import Credentials
             credentials = Credentials.from_authorized_user_file(token_file, SCOPES)
-            # Auto-refresh if expired
-            if credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
+            # Auto-refresh if expired or about to
+            refresh_credentials(credentials, token_file)
         except Exception as e:
             logging.error(f"Authentication failed: {str(e)}")
             logging.critical("Manual re-authentication required! Delete token file and restart.")
@@ -90,42 +210,243 @@ def authenticate_channel(client_secrets_file, token_file):
 
     # First-time authentication
     if not credentials:
+        if not ALLOW_INTERACTIVE_AUTH:
+            raise SystemExit(f"No stored token at {token_file}; run the uploader interactively once to authorise")
+        from google_auth_oauthlib.flow import InstalledAppFlow
         flow = InstalledAppFlow.from_client_secrets_file(client_secrets_file, SCOPES)
         credentials = flow.run_local_server(port=0)
         with open(token_file, "w") as token:
             token.write(credentials.to_json())
 
-    return build("youtube", "v3", credentials=credentials)
+    with _credentials_lock:
+        _credentials[token_file] = credentials
+    return credentials
 
+def refresh_all_credentials(channels_config):
+    """Load and refresh every channel's stored token concurrently"""
+    configs = [config for config in channels_config if os.path.exists(config["token_file"])]
+    if not configs:
+        return
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+        futures = {
+            executor.submit(load_credentials, config["client_secrets_file"], config["token_file"]): config["channel_id"]
+            for config in configs
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except BaseException as e:
+                # Reported again when the channel itself authenticates
+                logging.error(f"Token refresh failed for channel {futures[future]}: {e}")
+    logging.info(f"Refreshed credentials for {len(configs)} channels in {time.monotonic() - started:.2f}s")
 
+def authenticate_channel(client_secrets_file, token_file):
+    """Authenticates a channel with automatic token management"""
+    return build_youtube(credentials=load_credentials(client_secrets_file, token_file))
 
 
 # Function: Get Newest Video File from Folder
 
+FOLDER_INDEX_DIR = os.path.join(TRACKING_DIR, "folder_index")
+FOLDER_RESCAN_SECONDS = 24 * 3600  # Full rescan even if the directory mtime did not change
+
+
+class FolderIndex:
+    """Persistent per-folder index of video files and their upload state
+
+    Each entry keeps the file's mtime, size, extracted video ID and whether it
+    is uploaded. The folder is only rescanned when its own mtime changes (files
+    added, removed or renamed) or the index is older than FOLDER_RESCAN_SECONDS,
+    and unchanged entries keep their state across rescans.
+    """
+
+    def __init__(self, folder_path, index_dir=FOLDER_INDEX_DIR):
+        self.folder_path = folder_path
+        key = hashlib.sha1(os.path.abspath(folder_path).lower().encode()).hexdigest()[:16]
+        self.index_file = os.path.join(index_dir, f"{key}.json")
+        self.lock = threading.Lock()
+        self.dir_mtime = None
+        self.scanned_at = 0
+        self.files = {}
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r") as f:
+                    data = json.load(f)
+                self.dir_mtime = data.get("dir_mtime")
+                self.scanned_at = data.get("scanned_at", 0)
+                self.files = data.get("files", {})
+            except (OSError, ValueError) as e:
+                logging.warning(f"Rebuilding unreadable folder index {self.index_file}: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({
+                "folder": os.path.abspath(self.folder_path),
+                "dir_mtime": self.dir_mtime,
+                "scanned_at": self.scanned_at,
+                "files": self.files
+            }, f)
+        os.replace(tmp_file, self.index_file)
+
+    def refresh(self):
+        """Rescan the folder if it changed; returns True when a scan ran"""
+        with self.lock:
+            dir_mtime = os.stat(self.folder_path).st_mtime_ns
+            if dir_mtime == self.dir_mtime and time.time() - self.scanned_at < FOLDER_RESCAN_SECONDS:
+                return False
+            files = {}
+            with os.scandir(self.folder_path) as entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(VIDEO_EXTENSIONS) or not entry.is_file():
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError as e:
+                        logging.error(f"Error accessing {entry.name}: {e}")
+                        continue
+                    old = self.files.get(entry.name)
+                    if old and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size:
+                        files[entry.name] = old
+                    else:
+                        files[entry.name] = {
+                            "mtime": stat.st_mtime,
+                            "size": stat.st_size,
+                            "video_id": extract_video_id(entry.name),
+                            "uploaded": False
+                        }
+            self.files = files
+            self.dir_mtime = dir_mtime
+            self.scanned_at = time.time()
+            self._save()
+            return True
+
+    def pending(self, uploaded_ids, limit=None):
+        """Newest not-yet-uploaded files as (path, video_id)
+
+        uploaded_ids is the tracking set; entries found in it are flagged in
+        the index so later queries skip them without a lookup.
+        """
+        with self.lock:
+            candidates = sorted(
+                ((name, entry) for name, entry in self.files.items()
+                 if entry["video_id"] and not entry["uploaded"]),
+                key=lambda item: item[1]["mtime"], reverse=True
+            )
+            result = []
+            changed = False
+            for name, entry in candidates:
+                if entry["video_id"] in uploaded_ids:
+                    entry["uploaded"] = True
+                    changed = True
+                    continue
+                result.append((os.path.join(self.folder_path, name), entry["video_id"]))
+                if limit is not None and len(result) >= limit:
+                    break
+            if changed:
+                self._save()
+            return result
+
+    def mark_uploaded(self, file_path):
+        with self.lock:
+            entry = self.files.get(os.path.basename(file_path))
+            if entry:
+                entry["uploaded"] = True
+                self._save()
+
+
+_folder_indexes = {}
+_folder_indexes_lock = threading.Lock()
+
+def get_folder_index(folder_path):
+    """Process-wide FolderIndex for a folder"""
+    key = os.path.abspath(folder_path).lower()
+    with _folder_indexes_lock:
+        if key not in _folder_indexes:
+            _folder_indexes[key] = FolderIndex(folder_path, FOLDER_INDEX_DIR)
+        return _folder_indexes[key]
+
+def get_pending_video_files(folder_path, tracking_file, limit=None):
+    """Not-yet-uploaded video files in the folder, newest first"""
+    index = get_folder_index(folder_path)
+    index.refresh()
+    return index.pending(get_upload_tracker(tracking_file).ids, limit)
+
 def get_newest_video_file(folder_path, tracking_file):
     """Scans the folder for new video files using only the tracking file"""
-    video_files = []
-    for filename in os.listdir(folder_path):
-        if filename.lower().endswith(VIDEO_EXTENSIONS):
-            video_id = extract_video_id(filename)
-            if video_id and not is_video_uploaded(video_id, tracking_file):
-                full_path = os.path.join(folder_path, filename)
-                try:
-                    mod_time = os.path.getmtime(full_path)
-                    video_files.append((full_path, mod_time, video_id))
-                except Exception as e:
-                    logging.error(f"Error accessing {filename}: {e}")
-    
-    if not video_files:
+    pending = get_pending_video_files(folder_path, tracking_file, limit=1)
+    if not pending:
         return None, None
-    
-    video_files.sort(key=lambda x: x[1], reverse=True)
-    return video_files[0][0], video_files[0][2]
+    return pending[0]
 
 # Function: Upload Video to YouTube
 
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024   # Must be a multiple of 256 KiB
+UPLOAD_RETRIES = 8
+UPLOAD_SESSIONS_FILE = os.path.join(TRACKING_DIR, "upload_sessions.json")
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")   # 403s that pass within seconds
+
+upload_sessions_lock = threading.Lock()
+
+
+class RetriableUploadError(Exception):
+    """Transient server-side failure or rate limit on one upload chunk"""
+
+
+def load_upload_session(file_path):
+    """Saved resumable session for this exact file, if any"""
+    if not os.path.exists(UPLOAD_SESSIONS_FILE):
+        return None
+    with upload_sessions_lock:
+        with open(UPLOAD_SESSIONS_FILE, "r") as f:
+            session = json.load(f).get(os.path.abspath(file_path))
+    if session and session.get("size") == os.path.getsize(file_path):
+        return session
+    return None
+
+def save_upload_session(file_path, session):
+    """Persists (or with session=None removes) a file's resumable upload state"""
+    os.makedirs(os.path.dirname(UPLOAD_SESSIONS_FILE), exist_ok=True)
+    with upload_sessions_lock:
+        sessions = {}
+        if os.path.exists(UPLOAD_SESSIONS_FILE):
+            with open(UPLOAD_SESSIONS_FILE, "r") as f:
+                sessions = json.load(f)
+        if session is None:
+            sessions.pop(os.path.abspath(file_path), None)
+        else:
+            sessions[os.path.abspath(file_path)] = session
+        tmp_file = f"{UPLOAD_SESSIONS_FILE}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(sessions, f, indent=2)
+        os.replace(tmp_file, UPLOAD_SESSIONS_FILE)
+
+def is_retriable_upload_error(e):
+    import httplib2
+    return isinstance(e, (RetriableUploadError, OSError, httplib2.HttpLib2Error))
+
+@retry(
+    stop=stop_after_attempt(UPLOAD_RETRIES),
+    wait=wait_exponential(multiplier=1, min=2, max=60),
+    retry=retry_if_exception(is_retriable_upload_error),
+    reraise=True
+)
+def send_next_chunk(request):
+    """Sends one chunk; after a failure the client re-queries the server offset first"""
+    from googleapiclient.errors import HttpError
+    try:
+        return request.next_chunk()
+    except HttpError as e:
+        if e.resp.status in RETRIABLE_STATUS_CODES or has_error_reason(e, RATE_LIMIT_REASONS):
+            logging.warning(f"Retriable upload error {e.resp.status}, backing off")
+            raise RetriableUploadError(str(e)) from e
+        raise
+
 def upload_video(youtube, file_path, config, title, description, tags, privacy_status, category_id):
-    """Uploads video"""
+    """Uploads video in resumable chunks, continuing a saved session if one exists"""
 
    # if config.get("use_filename_as_title", False):
     #    title = os.path.splitext(os.path.basename(file_path))[0]  # Filename without extension
@@ -133,7 +454,10 @@ def upload_video(youtube, file_path, config, title, description, tags, privacy_s
     #    title = config["default_title"]
 
     logging.info(f"Uploading video: {file_path}")
-    media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+    chunk_size = config.get("upload_chunk_size", UPLOAD_CHUNK_SIZE)
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaFileUpload
+    media = MediaFileUpload(file_path, chunksize=chunk_size, resumable=True)
     body = {
         "snippet": {
             "title": title,
@@ -150,118 +474,435 @@ def upload_video(youtube, file_path, config, title, description, tags, privacy_s
         body=body,
         media_body=media
     )
-    response = request.execute()
+
+    session = load_upload_session(file_path)
+    if session:
+        # An error-state request asks the server how much it already has before sending
+        logging.info(f"Resuming upload of {file_path} from byte {session['progress']}")
+        request.resumable_uri = session["uri"]
+        request.resumable_progress = session["progress"]
+        request._in_error_state = True
+
+    size = media.size()
+    response = None
+    while response is None:
+        try:
+            status, response = send_next_chunk(request)
+        except HttpError as e:
+            if session and e.resp.status in (404, 410):
+                # Session expired on the server side; start over with a fresh one
+                logging.warning(f"Saved upload session for {file_path} expired, restarting")
+                save_upload_session(file_path, None)
+                session = None
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                request._in_error_state = False
+                continue
+            raise
+        if request.resumable_uri:
+            session = {"uri": request.resumable_uri, "progress": request.resumable_progress, "size": size}
+            save_upload_session(file_path, session)
+        if status:
+            logging.info(f"Uploaded {status.resumable_progress}/{size} bytes ({status.progress():.0%}) of {os.path.basename(file_path)}")
+
+    save_upload_session(file_path, None)
     video_id = response.get("id")
     logging.info(Fore.GREEN + f"Successfully uploaded video. Video ID: {video_id}")
     return video_id
 
 
-# Main Function
+# Function: Quota ledger and upload planning
 
-def main():
-            
-    # Channel configuration
-    
-    channels_config = [
-        
-          {
-               "channel_id": "clipper645",
-               "channel_url": "https://www.youtube.com/channel/UCt5CNZvZuucHT6JKsTvYTQg",
-               "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper645_client_secret.json",
-               "token_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper645_token.json",
-               #"use_filename_as_title": False,
-               "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\The rookie",
-               "default_title": "The Rookie #TheRookieSeason7 #Chenford #TVShow",
-               "default_description": "Check out my new video on 'The Rookie'.... #CrimeDrama #PoliceDrama #TVShow #TheRookieSeason7 #Chenford #TheRookieABC",
-               "tags": ["CrimeDrama", "PoliceDrama", "TVShow", "TheRookieSeason7", "Chenford", "TheRookieABC"],
-               "privacy_status": "public",
-               "category_id": "24"
-           },
-        
-           {
-               "channel_id": "shutterclips",
-               "channel_url" : "https://www.youtube.com/channel/UCUj8fHYxqJwtwKVt8YHxMgg",
-               "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\shutterclips_client_secret.json",
-               "token_file": r"C:\Users\meetd\Desktop\YT root\auth\shutterclips_token.json",
-               "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Shows - Young sheldon, BBT",
-               #"use_filename_as_title": True,
-               "default_title": "The Big Bang Theory #shorts # youngsheldon #BBT #TVShow",
-               "default_description": "Check out my new video on 'big bang theory'.... #Drama #BBT #TVShow #youngsheldon #missy #georgie #mandy",
-               "tags": ["Drama", "BBT", "TVShow", "youngsheldon", "mandy", "georgie"],
-               "privacy_status": "public",
-               "category_id": "24"
-           },
-    
-           {
-               "channel_id": "clipper644",
-               "channel_url" : "https://www.youtube.com/channel/UCZVwI-TV4eA2HjYwoiLjefg",
-               "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper644_client_secret.json",
-               "token_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper644_token.json",
-               "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Shows - station19, lucifer, brba, bcs, mr. inbetween",
-               #"use_filename_as_title": True,
-               "default_title": "Bay harbour cooker vs lawyer. #shorts #Jesse #Walter #TVShow",
-               "default_description": "Check out my new video.... #Drama #jesse #TVShow #brba #bettercallsaul #Heisenberg #skyler #breakingbad",
-               "tags": ["Drama", "jesse", "TVShow", "bettercallsaul", "breakingbad", "Gustavo"],
-               "privacy_status": "public",
-               "category_id": "24"
-            },    
-                
-            {     
-               "channel_id": "superheromania646",
-               "channel_url" : "https://www.youtube.com/channel/UC_T7Wn0_bN-_tSoj2OlOB1Q",
-               "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\superheromania646_client_secret.json",
-               "token_file": r"C:\Users\meetd\Desktop\YT root\auth\superheromania646_token.json",
-               "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Marvels",
-               #"use_filename_as_title": True,
-               "default_title": "Marvel Cinematic Universe #ironman #Tony #Superhero",
-               "default_description": "Check out my new video.... #ironman #Avengers #rdj #peter #thor #spiderman #stanlee #thanos #doctorstrange #shorts #viralvideo #loki #marvel ",
-               "tags": ["Tony", "Marvel", "Superhero", "Loki", "Disney", "Avengers"],
-               "privacy_status": "public",
-               "category_id": "24"
-           }
-    ]
-    
-    
+QUOTA_LEDGER_FILE = os.path.join(TRACKING_DIR, "quota_ledger.json")
+DAILY_QUOTA = 10000        # Default units per OAuth project per day
+UPLOAD_QUOTA_COST = 1600   # Units charged for one videos().insert
+QUOTA_ERROR_REASONS = ("quotaExceeded", "dailyLimitExceeded")   # The project's daily quota is spent
+UPLOAD_LIMIT_REASONS = ("uploadLimitExceeded",)                  # Only this channel's upload cap is hit
+
+try:
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except ZoneInfoNotFoundError:
+    # Windows without the tzdata package; quota days follow Pacific standard time
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+
+def seconds_until_quota_reset():
+    now = datetime.now(QUOTA_TIMEZONE)
+    midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+def quota_day():
+    """Current quota window; YouTube resets quota at midnight Pacific time"""
+    return datetime.now(QUOTA_TIMEZONE).strftime("%Y-%m-%d")
+
+def quota_project(client_secrets_file):
+    """Quota is per OAuth project, so channels sharing a client secret share a budget"""
+    try:
+        with open(client_secrets_file, "r") as f:
+            secrets = json.load(f)
+        return (secrets.get("installed") or secrets.get("web") or {})["client_id"]
+    except (OSError, ValueError, KeyError):
+        return os.path.abspath(client_secrets_file)
+
+def has_error_reason(e, reasons):
+    from googleapiclient.errors import HttpError
+    return isinstance(e, HttpError) and e.resp.status == 403 and any(
+        reason in str(e.content) for reason in reasons
+    )
+
+def is_quota_error(e):
+    return has_error_reason(e, QUOTA_ERROR_REASONS)
+
+
+class QuotaLedger:
+    """Units spent per OAuth project in the current quota day, persisted locally
+
+    The ledger file is shared by every uploader process; each change re-reads
+    it under a file lock so concurrent runs never hand out the same units.
+    """
+
+    def __init__(self, ledger_file=None):
+        self.ledger_file = ledger_file or QUOTA_LEDGER_FILE
+        self.lock_file = f"{self.ledger_file}.lock"
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.ledger_file), exist_ok=True)
+
+    def _read(self):
+        if not os.path.exists(self.ledger_file):
+            return {}
+        try:
+            with open(self.ledger_file, "r") as f:
+                return json.load(f)
+        except ValueError:
+            logging.warning(f"Resetting unreadable quota ledger {self.ledger_file}")
+            return {}
+
+    def _write(self, ledger):
+        tmp_file = f"{self.ledger_file}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(ledger, f, indent=2)
+        os.replace(tmp_file, self.ledger_file)
+
+    def used(self, project):
+        with self.lock, file_lock(self.lock_file):
+            entry = self._read().get(project, {})
+        return entry.get("used", 0) if entry.get("day") == quota_day() else 0
+
+    def reserve(self, project, cost, quota):
+        """Charge cost units if the day's budget allows it; returns False otherwise"""
+        with self.lock, file_lock(self.lock_file):
+            ledger = self._read()
+            today = quota_day()
+            entry = ledger.get(project, {})
+            used = entry.get("used", 0) if entry.get("day") == today else 0
+            if used + cost > quota:
+                return False
+            ledger[project] = {"day": today, "used": used + cost}
+            self._write(ledger)
+            return True
+
+    def exhaust(self, project, quota):
+        """The API reported the quota spent; nothing more goes out today"""
+        with self.lock, file_lock(self.lock_file):
+            ledger = self._read()
+            ledger[project] = {"day": quota_day(), "used": quota}
+            self._write(ledger)
+
+
+def plan_uploads(channels_config, ledger):
+    """Uploads allowed per channel this run, within each project's remaining quota
+
+    Channels sharing a project take turns one upload at a time so the budget
+    is spread across them; whatever does not fit waits for the next quota day.
+    """
+    projects = {}
+    wanted = {}
     for config in channels_config:
- 
-        TRACKING_FILE = os.path.join(TRACKING_DIR, f"uploaded_videos_{config['channel_id']}.json")
-        
-        logging.info(f"Processing uploads for channel ({config['channel_id']}) ")
-        youtube = authenticate_channel(config["client_secrets_file"], config["token_file"])
-        
-        # Prompt for a new folder path if all videos in the original folder are uploaded
-        """while True:
-            folder_uploaded = check_folder_upload_status(config["source_folder"], uploaded_videos)
-            if not folder_uploaded:
+        channel = config["channel_id"]
+        tracking_file = os.path.join(TRACKING_DIR, f"uploaded_videos_{channel}.json")
+        max_uploads = config.get("max_uploads_per_run", MAX_UPLOADS_PER_RUN)
+        try:
+            wanted[channel] = len(get_pending_video_files(config["source_folder"], tracking_file, limit=max_uploads))
+        except OSError as e:
+            logging.error(f"Cannot scan source folder for channel {channel}: {e}")
+            wanted[channel] = 0
+        projects.setdefault(quota_project(config["client_secrets_file"]), []).append(config)
+
+    plan = {}
+    for project, configs in projects.items():
+        quota = configs[0].get("daily_quota", DAILY_QUOTA)
+        cost = configs[0].get("upload_quota_cost", UPLOAD_QUOTA_COST)
+        budget = max(quota - ledger.used(project), 0) // cost
+        allowed = {config["channel_id"]: 0 for config in configs}
+        while budget:
+            progressed = False
+            for config in configs:
+                channel = config["channel_id"]
+                if budget and allowed[channel] < wanted[channel]:
+                    allowed[channel] += 1
+                    budget -= 1
+                    progressed = True
+            if not progressed:
                 break
-            logging.info(f"All videos in folder '{config['source_folder']}' have been uploaded.")
-            new_folder = input("Please enter the path to another folder to process (or press Enter to skip): ").strip()
-            if not new_folder:
-                logging.info("No additional folder provided. Skipping to the next channel.")
-                break  # Exit
-            config["source_folder"] = new_folder
-"""
-        # Get the newest video file, ignoring already uploaded videos
-        newest_video, video_id = get_newest_video_file(config["source_folder"], TRACKING_FILE)
-        if newest_video is None:
-            logging.warning(f"No new video found in folder: {config['source_folder']}")
-            continue
-
-        # Prepare metadata and upload
-        video_filename = os.path.basename(newest_video)
-        title = config['default_title'] #video_filename
-        description = f"{config['default_description']}\nUploaded on: {datetime.now()}"
-        tags = config["tags"]
-        privacy_status = config["privacy_status"]
-        categoryId = config["category_id"]
+        for channel, count in allowed.items():
+            deferred = wanted[channel] - count
+            if deferred:
+                logging.warning(Fore.YELLOW + f"Deferring {deferred} uploads for channel {channel} to the next quota day")
+        plan.update(allowed)
+    return plan
+
+
+# Function: Storage budget for source folders
+
+# Per source folder byte budget, e.g. 50 * 1024 ** 3; channels opt in with
+# "storage_budget_bytes". None keeps every file.
+STORAGE_BUDGET_BYTES = None
+
+
+def get_channel_storage(config):
+    """StorageManager for a channel's source folder; only uploaded files are evictable"""
+    tracking_file = os.path.join(TRACKING_DIR, f"uploaded_videos_{config['channel_id']}.json")
+
+    def is_uploaded(path):
+        if is_video_uploaded(extract_video_id(os.path.basename(path)), tracking_file):
+            return True
+        return get_content_index().was_uploaded(path, config["channel_id"])
+
+    budget = config.get("storage_budget_bytes", STORAGE_BUDGET_BYTES)
+    return get_storage_manager(config["source_folder"], budget, is_uploaded)
+
+def enforce_storage_budget(config):
+    """Evict uploaded files once the source folder is over its budget"""
+    storage = get_channel_storage(config)
+    if not storage.budget_bytes or storage.has_space():
+        return []
+    return storage.evict()
+
+
+# Function: Upload pending videos for one channel
+
+PREPARE_UPLOADS = False   # Remux/transcode before uploading (see prepare.py); channels opt in with "prepare_uploads"
+
+
+class QuotaExhausted(Exception):
+    """No quota left for this channel's project until the next quota day"""
+
+
+class UploadLimitReached(QuotaExhausted):
+    """The channel hit its own upload cap; other channels on the project carry on"""
+
+
+def upload_file(config, youtube, video_path, video_id, ledger=None):
+    """Upload one file within the channel's quota and record it as uploaded
+
+    Returns the new YouTube ID, or None if identical content was already
+    uploaded to the channel.
+    """
+    channel = config["channel_id"]
+    tracking_file = os.path.join(TRACKING_DIR, f"uploaded_videos_{channel}.json")
+    project = quota_project(config["client_secrets_file"])
+    quota = config.get("daily_quota", DAILY_QUOTA)
+    cost = config.get("upload_quota_cost", UPLOAD_QUOTA_COST)
+
+    # The same clip saved under another name or ID was already uploaded here
+    content_hash = None
+    try:
+        content_hash, _ = get_content_index().add_file(video_path, video_id)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"Content hash failed for {video_path}: {e}")
+    existing = content_hash and get_content_index().uploaded_to(content_hash, channel)
+    if existing:
+        logging.info(f"Skipping {os.path.basename(video_path)}: same content already uploaded to {channel} as {existing}")
+        log_uploaded_video(video_id, tracking_file)
+        get_folder_index(config["source_folder"]).mark_uploaded(video_path)
+        return None
+
+    work_queue = get_work_queue()
+    if work_queue is not None and not work_queue.claim(UPLOAD, channel, video_id):
+        if work_queue.is_done(UPLOAD, channel, video_id):
+            log_uploaded_video(video_id, tracking_file)
+            get_folder_index(config["source_folder"]).mark_uploaded(video_path)
+        logging.info(f"Skipping {os.path.basename(video_path)}: uploaded or leased by another node")
+        return None
+
+    # A session saved for the unprepared file is resumed rather than restarted
+    upload_path = video_path
+    if content_hash and config.get("prepare_uploads", PREPARE_UPLOADS) and not load_upload_session(video_path):
+        upload_path = get_preparer().prepare(video_path, content_hash)
+
+    # Resuming a saved session does not start a new insert, so it costs nothing
+    if ledger and not load_upload_session(upload_path) and not ledger.reserve(project, cost, quota):
+        if work_queue is not None:
+            work_queue.release(UPLOAD, channel, video_id)
+        raise QuotaExhausted(f"Quota spent for project {project}")
+    title = config['default_title']
+    description = f"{config['default_description']}\nUploaded on: {datetime.now()}"
+    try:
+        uploaded_id = upload_video(youtube, upload_path, config, title, description, config['tags'], config['privacy_status'], config["category_id"])
+    except BaseException as e:
+        if work_queue is not None:
+            work_queue.release(UPLOAD, channel, video_id)
+        if is_quota_error(e):
+            if ledger:
+                ledger.exhaust(project, quota)
+            raise QuotaExhausted(f"API reports quota exceeded for project {project}") from e
+        if has_error_reason(e, UPLOAD_LIMIT_REASONS):
+            raise UploadLimitReached(f"API reports upload limit reached for channel {channel}") from e
+        raise
+    if work_queue is not None:
+        work_queue.complete(UPLOAD, channel, video_id)
+    log_uploaded_video(video_id, tracking_file)
+    get_folder_index(config["source_folder"]).mark_uploaded(video_path)
+    if content_hash:
+        get_content_index().mark_uploaded(content_hash, channel, uploaded_id)
+    return uploaded_id
+
+
+def upload_channel(config, allowance=None, ledger=None):
+    """Authenticates and drains up to max_uploads_per_run files for one channel"""
+    channel = config["channel_id"]
+    tracking_file = os.path.join(TRACKING_DIR, f"uploaded_videos_{channel}.json")
+    max_uploads = config.get("max_uploads_per_run", MAX_UPLOADS_PER_RUN)
+    if allowance is not None:
+        max_uploads = min(max_uploads, allowance)
+    interval = config.get("upload_interval", UPLOAD_INTERVAL)
+
+    logging.info(f"Processing uploads for channel ({channel}) ")
+    enforce_storage_budget(config)
+    if max_uploads <= 0:
+        logging.info(f"No quota left for channel {channel} until the next quota day")
+        return 0
+    pending = get_pending_video_files(config["source_folder"], tracking_file, limit=max_uploads)
+    if not pending:
+        logging.warning(f"No new video found in folder: {config['source_folder']}")
+        return 0
+
+    if config.get("prepare_uploads", PREPARE_UPLOADS):
+        # Later files are prepared on the process pool while earlier ones upload
+        get_preparer().prefetch([video_path for video_path, _ in pending])
+
+    youtube = authenticate_channel(config["client_secrets_file"], config["token_file"])
+    credentials = load_credentials(config["client_secrets_file"], config["token_file"])
+
+    uploaded = 0
+    for index, (video_path, video_id) in enumerate(pending):
+        if index:
+            # Per-channel pacing replaces the old global sleep between channels
+            time.sleep(interval)
+        # Long pacing intervals can outlive the access token
+        refresh_credentials(credentials, config["token_file"])
         try:
-            upload_video(youtube, newest_video, config, title, description, config['tags'], config['privacy_status'], config["category_id"])
-            log_uploaded_video(video_id, TRACKING_FILE)
-            time.sleep(60)
+            if upload_file(config, youtube, video_path, video_id, ledger):
+                uploaded += 1
+        except QuotaExhausted as e:
+            logging.warning(Fore.YELLOW + f"{e}; deferring {len(pending) - index} uploads for channel {channel}")
+            break
         except Exception as e:
-            logging.error(f"Error uploading video for channel: {e}")
-        
+            logging.error(f"Error uploading video for channel {channel}: {e}")
+    return uploaded
+
+def run_channel(config, allowance=None, ledger=None):
+    """Thread entry point: one channel's failure must not stop the others"""
+    try:
+        return upload_channel(config, allowance, ledger)
+    except BaseException as e:
+        logging.error(f"Channel {config['channel_id']} aborted: {e}")
+        return 0
+
+
+# Channel configuration
+
+CHANNELS_CONFIG = [
     
+      {
+           "channel_id": "clipper645",
+           "channel_url": "https://www.youtube.com/channel/UCt5CNZvZuucHT6JKsTvYTQg",
+           "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper645_client_secret.json",
+           "token_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper645_token.json",
+           #"use_filename_as_title": False,
+           "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\The rookie",
+           "default_title": "The Rookie #TheRookieSeason7 #Chenford #TVShow",
+           "default_description": "Check out my new video on 'The Rookie'.... #CrimeDrama #PoliceDrama #TVShow #TheRookieSeason7 #Chenford #TheRookieABC",
+           "tags": ["CrimeDrama", "PoliceDrama", "TVShow", "TheRookieSeason7", "Chenford", "TheRookieABC"],
+           "privacy_status": "public",
+           "category_id": "24"
+       },
+    
+       {
+           "channel_id": "shutterclips",
+           "channel_url" : "https://www.youtube.com/channel/UCUj8fHYxqJwtwKVt8YHxMgg",
+           "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\shutterclips_client_secret.json",
+           "token_file": r"C:\Users\meetd\Desktop\YT root\auth\shutterclips_token.json",
+           "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Shows - Young sheldon, BBT",
+           #"use_filename_as_title": True,
+           "default_title": "The Big Bang Theory #shorts # youngsheldon #BBT #TVShow",
+           "default_description": "Check out my new video on 'big bang theory'.... #Drama #BBT #TVShow #youngsheldon #missy #georgie #mandy",
+           "tags": ["Drama", "BBT", "TVShow", "youngsheldon", "mandy", "georgie"],
+           "privacy_status": "public",
+           "category_id": "24"
+       },
+
+       {
+           "channel_id": "clipper644",
+           "channel_url" : "https://www.youtube.com/channel/UCZVwI-TV4eA2HjYwoiLjefg",
+           "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper644_client_secret.json",
+           "token_file": r"C:\Users\meetd\Desktop\YT root\auth\clipper644_token.json",
+           "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Shows - station19, lucifer, brba, bcs, mr. inbetween",
+           #"use_filename_as_title": True,
+           "default_title": "Bay harbour cooker vs lawyer. #shorts #Jesse #Walter #TVShow",
+           "default_description": "Check out my new video.... #Drama #jesse #TVShow #brba #bettercallsaul #Heisenberg #skyler #breakingbad",
+           "tags": ["Drama", "jesse", "TVShow", "bettercallsaul", "breakingbad", "Gustavo"],
+           "privacy_status": "public",
+           "category_id": "24"
+        },    
+            
+        {     
+           "channel_id": "superheromania646",
+           "channel_url" : "https://www.youtube.com/channel/UC_T7Wn0_bN-_tSoj2OlOB1Q",
+           "client_secrets_file": r"C:\Users\meetd\Desktop\YT root\auth\superheromania646_client_secret.json",
+           "token_file": r"C:\Users\meetd\Desktop\YT root\auth\superheromania646_token.json",
+           "source_folder": r"C:\Users\meetd\Desktop\YT root\Media\Marvels",
+           #"use_filename_as_title": True,
+           "default_title": "Marvel Cinematic Universe #ironman #Tony #Superhero",
+           "default_description": "Check out my new video.... #ironman #Avengers #rdj #peter #thor #spiderman #stanlee #thanos #doctorstrange #shorts #viralvideo #loki #marvel ",
+           "tags": ["Tony", "Marvel", "Superhero", "Loki", "Disney", "Avengers"],
+           "privacy_status": "public",
+           "category_id": "24"
+       }
+]
+
+
+# Main Function
+
+def run_uploads(channels_config):
+    """Upload for every channel at once; returns {channel_id: uploads}"""
+    # One worker per channel; total time is bounded by the slowest channel
+    started = time.monotonic()
+    refresh_all_credentials(channels_config)
+    ledger = QuotaLedger()
+    plan = plan_uploads(channels_config, ledger)
+    with ThreadPoolExecutor(max_workers=len(channels_config)) as executor:
+        futures = {
+            executor.submit(run_channel, config, plan.get(config["channel_id"]), ledger): config["channel_id"]
+            for config in channels_config
+        }
+        results = {}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    close_preparer()
+    close_upload_trackers()
+    close_content_index()
+    close_work_queue()
+
+    total = sum(results.values())
+    logging.info(
+        f"Uploaded {total} videos across {len(results)} channels in {time.monotonic() - started:.0f}s "
+        f"({', '.join(f'{channel}: {count}' for channel, count in results.items())})"
+    )
+    return results
+
+def main():
+    run_uploads(CHANNELS_CONFIG)
     logging.info(Fore.GREEN + "Script execution completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+"""Lease-based work claims shared by several download/upload nodes
+
+Every node opens the same SQLite file (e.g. on a network share). Before a node
+downloads a video or uploads a file it claims the job with a time-limited
+lease; a heartbeat renews the leases it holds, so a lease only expires when its
+node died. Completing a job records it in the shared downloads/uploads table
+and drops the lease in one transaction.
+
+The database uses the rollback journal rather than WAL, because WAL's shared
+memory index does not work across machines on network filesystems.
+"""
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+# Shared SQLite file for multi-node runs (e.g. on a network share); unset = single node
+WORK_QUEUE_FILE = os.environ.get("YT_WORK_QUEUE")
+LEASE_SECONDS = 600         # A claim lapses this long after its node's last heartbeat
+HEARTBEAT_INTERVAL = 60
+
+DOWNLOAD = "download"
+UPLOAD = "upload"
+_DONE_TABLES = {DOWNLOAD: "downloads", UPLOAD: "uploads"}
+
+
+class LeaseQueue:
+    def __init__(self, db_file, node_id=None, lease_seconds=LEASE_SECONDS):
+        self.db_file = db_file
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.held = set()
+        self.db = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=60)
+        self.db.execute("PRAGMA journal_mode=DELETE")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " kind TEXT NOT NULL, channel_id TEXT NOT NULL, video_id TEXT NOT NULL,"
+            " owner TEXT NOT NULL, expires_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 1,"
+            " PRIMARY KEY (kind, channel_id, video_id))"
+        )
+        for table in _DONE_TABLES.values():
+            self.db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " channel_id TEXT NOT NULL, video_id TEXT NOT NULL, node TEXT, completed_at REAL,"
+                " PRIMARY KEY (channel_id, video_id))"
+            )
+        self.stop_event = threading.Event()
+        self.heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+        self.heartbeat.start()
+        logging.info(f"Work queue {db_file} as node {self.node_id}")
+
+    def _transaction(self, statements):
+        """Run [(sql, params)] atomically; BEGIN IMMEDIATE serialises writers across nodes"""
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                results = [self.db.execute(sql, params).fetchall() for sql, params in statements]
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return results
+
+    def is_done(self, kind, channel_id, video_id):
+        with self.lock:
+            row = self.db.execute(
+                f"SELECT 1 FROM {_DONE_TABLES[kind]} WHERE channel_id = ? AND video_id = ?", (channel_id, video_id)
+            ).fetchone()
+        return row is not None
+
+    def claim(self, kind, channel_id, video_id):
+        """Take the job unless it is done or another node holds a live lease"""
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                done = self.db.execute(
+                    f"SELECT 1 FROM {_DONE_TABLES[kind]} WHERE channel_id = ? AND video_id = ?", (channel_id, video_id)
+                ).fetchone()
+                lease = self.db.execute(
+                    "SELECT owner, expires_at FROM leases WHERE kind = ? AND channel_id = ? AND video_id = ?",
+                    (kind, channel_id, video_id)
+                ).fetchone()
+                claimed = not done and (lease is None or lease[0] == self.node_id or lease[1] < now)
+                if claimed:
+                    if lease is not None and lease[0] != self.node_id:
+                        logging.warning(f"Reclaiming expired {kind} lease on {video_id} from {lease[0]}")
+                    self.db.execute(
+                        "INSERT INTO leases (kind, channel_id, video_id, owner, expires_at) VALUES (?, ?, ?, ?, ?)"
+                        " ON CONFLICT(kind, channel_id, video_id) DO UPDATE SET"
+                        " owner = excluded.owner, expires_at = excluded.expires_at, attempts = attempts + 1",
+                        (kind, channel_id, video_id, self.node_id, now + self.lease_seconds)
+                    )
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            if claimed:
+                self.held.add((kind, channel_id, video_id))
+        return claimed
+
+    def complete(self, kind, channel_id, video_id):
+        """Record the job as done and drop its lease in one transaction"""
+        self._transaction([
+            (f"INSERT OR IGNORE INTO {_DONE_TABLES[kind]} (channel_id, video_id, node, completed_at) VALUES (?, ?, ?, ?)",
+             (channel_id, video_id, self.node_id, time.time())),
+            ("DELETE FROM leases WHERE kind = ? AND channel_id = ? AND video_id = ?", (kind, channel_id, video_id))
+        ])
+        with self.lock:
+            self.held.discard((kind, channel_id, video_id))
+
+    def release(self, kind, channel_id, video_id):
+        """Give up a claim after a failure so any node may retry it"""
+        self._transaction([
+            ("DELETE FROM leases WHERE kind = ? AND channel_id = ? AND video_id = ? AND owner = ?",
+             (kind, channel_id, video_id, self.node_id))
+        ])
+        with self.lock:
+            self.held.discard((kind, channel_id, video_id))
+
+    def _renew_loop(self):
+        while not self.stop_event.wait(HEARTBEAT_INTERVAL):
+            with self.lock:
+                held = list(self.held)
+            if not held:
+                continue
+            expires_at = time.time() + self.lease_seconds
+            try:
+                self._transaction([
+                    ("UPDATE leases SET expires_at = ? WHERE kind = ? AND channel_id = ? AND video_id = ? AND owner = ?",
+                     (expires_at, kind, channel_id, video_id, self.node_id))
+                    for kind, channel_id, video_id in held
+                ])
+            except sqlite3.Error as e:
+                logging.warning(f"Lease renewal failed: {str(e)}")
+
+    def close(self):
+        """Stop renewing and release every lease still held"""
+        self.stop_event.set()
+        self.heartbeat.join()
+        for kind, channel_id, video_id in list(self.held):
+            self.release(kind, channel_id, video_id)
+        with self.lock:
+            self.db.close()
+
+
+_work_queue = None
+_work_queue_lock = threading.Lock()
+
+def get_work_queue(db_file=None):
+    """Process-wide LeaseQueue, or None when no queue file is configured"""
+    global _work_queue
+    db_file = db_file or WORK_QUEUE_FILE
+    if not db_file:
+        return None
+    with _work_queue_lock:
+        if _work_queue is None:
+            _work_queue = LeaseQueue(db_file)
+        return _work_queue
+
+def close_work_queue():
+    global _work_queue
+    with _work_queue_lock:
+        if _work_queue is not None:
+            _work_queue.close()
+            _work_queue = None